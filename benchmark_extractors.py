@@ -0,0 +1,119 @@
+'''
+Benchmark the dominant colour extractors on recorded or synthetic frames.
+
+    python benchmark_extractors.py --source synthetic --frames 100
+    python benchmark_extractors.py --source replay:show.raw --resolutions 400x300,1920x1080
+
+For every extractor and resolution it reports per-call latency percentiles,
+peak traced allocation per call and the mean CIE76 delta E between its
+palette and the reference extractor's palette on the same frames.
+'''
+import argparse
+import json
+import tracemalloc
+from time import perf_counter
+
+import cv2
+import numpy as np
+
+from colour_extractors import EXTRACTORS, make_extractor
+from frame_sources import open_source
+
+
+def load_frames(source_spec, count):
+    frames = []
+    with open_source(source_spec) as source:
+        for frame in source:
+            # Own the pixels, sources may hand out views of a reused buffer
+            frames.append(np.array(frame[:, :, :3]))
+            if len(frames) == count:
+                break
+    if not frames:
+        raise ValueError(f"Source {source_spec!r} produced no frames")
+    return frames
+
+
+def to_lab(colors):
+    """[[b, g, r], ...] -> (K, 3) float CIELab."""
+    bgr = np.array(colors, dtype=np.float32).reshape(1, -1, 3) / 255.0
+    return cv2.cvtColor(bgr, cv2.COLOR_BGR2Lab)[0]
+
+
+def palette_delta_e(reference, candidate):
+    """Mean over the reference colours of the distance to the closest candidate colour."""
+    ref, cand = to_lab(reference), to_lab(candidate)
+    dists = np.linalg.norm(ref[:, None, :] - cand[None, :, :], axis=2)
+    return float(dists.min(axis=1).mean())
+
+
+def run_extractor(name, frames, K, alloc_samples):
+    extractor = make_extractor(name, K=K)
+    # One untimed call for imports, caches and first-frame initialisation
+    extractor(frames[0])
+
+    timings = []
+    results = []
+    for frame in frames:
+        start = perf_counter()
+        results.append(extractor(frame))
+        timings.append(perf_counter() - start)
+
+    # Allocation tracing slows everything down, so it is a separate pass
+    peaks = []
+    tracemalloc.start()
+    for frame in frames[:alloc_samples]:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        extractor(frame)
+        peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+
+    return np.array(timings) * 1e3, peaks, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", default="synthetic", help="frame source spec, see frame_sources.open_source")
+    parser.add_argument("--frames", type=int, default=60)
+    parser.add_argument("--resolutions", default="100x100,400x300,1920x1080",
+                        help="comma separated WxH sizes the frames are resized to")
+    parser.add_argument("--extractors", default=",".join(name for name in EXTRACTORS if name != "colorthief"),
+                        help="comma separated names from colour_extractors.EXTRACTORS")
+    parser.add_argument("--reference", default="mmcq", help="extractor the others are compared against")
+    parser.add_argument("-K", type=int, default=3)
+    parser.add_argument("--alloc-samples", type=int, default=10, help="frames traced for allocations")
+    parser.add_argument("--json", metavar="PATH", help="also write the results as JSON")
+    args = parser.parse_args()
+
+    # Reference first, the others are scored against its palettes
+    names = [args.reference] + [name for name in args.extractors.split(",") if name != args.reference]
+    sizes = [tuple(int(v) for v in res.lower().split("x")) for res in args.resolutions.split(",")]
+    source_frames = load_frames(args.source, args.frames)
+
+    report = []
+    print(f"{'extractor':<16}{'size':>11}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'peak KiB':>10}{'dE':>7}")
+    for size in sizes:
+        frames = [cv2.resize(frame, size, interpolation=cv2.INTER_AREA) for frame in source_frames]
+        reference = None
+        for name in names:
+            timings, peaks, results = run_extractor(name, frames, args.K, args.alloc_samples)
+            if name == args.reference:
+                reference = results
+            delta_e = float(np.mean([palette_delta_e(ref, res) for ref, res in zip(reference, results)]))
+
+            p50, p90, p99 = np.percentile(timings, [50, 90, 99])
+            peak = max(peaks) / 1024 if peaks else 0.0
+            print(f"{name:<16}{size[0]:>6}x{size[1]:<4}{p50:>9.2f}{p90:>9.2f}{p99:>9.2f}{peak:>10.0f}{delta_e:>7.2f}")
+            report.append({
+                "extractor": name, "width": size[0], "height": size[1],
+                "p50_ms": p50, "p90_ms": p90, "p99_ms": p99,
+                "peak_alloc_kib": peak, "delta_e": delta_e,
+            })
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+from time import monotonic
+
+import cv2
+import numpy as np
+
+
+def grab_bgra(sct, monitor):
+    """
+    Grab a region and wrap the raw BGRA bytes as a read-only (H, W, 4) view.
+    No pixel data is copied; the view keeps the mss buffer alive.
+    """
+    img = sct.grab(monitor)
+    frame = np.frombuffer(img.raw, dtype=np.uint8).reshape(img.height, img.width, 4)
+    frame.flags.writeable = False
+    return frame
+
+
+def to_bgr(frame, dst=None):
+    """
+    Return a BGR copy of a 3 or 4 channel frame, written into dst when given.
+    Only call this where the consumer needs to own or draw on the pixels.
+    """
+    if frame.shape[2] == 4:
+        return cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR, dst=dst)
+    if dst is None:
+        return frame.copy()
+    dst[...] = frame
+    return dst
+
+
+def compose_preview(frame, colors, strip_height=100, out=None):
+    """
+    Stack a BGR copy of frame above a strip of colour blocks.
+    This is the one place the display path copies the captured pixels.
+    """
+    height, width = frame.shape[:2]
+    if out is None or out.shape != (height + strip_height, width, 3):
+        out = np.empty((height + strip_height, width, 3), dtype=np.uint8)
+
+    to_bgr(frame, dst=out[:height])
+
+    # Equal width blocks, the last one absorbs the remainder
+    block_width = width // len(colors)
+    for i, color in enumerate(colors):
+        x1 = i * block_width
+        x2 = width if i == len(colors) - 1 else x1 + block_width
+        out[height:, x1:x2] = color[:3]
+
+    return out
+
+
+class Downsampler:
+    """
+    Area-averages captured frames straight into small preallocated tiles.
+
+    The analysis tile (default 100x100, what kmeans_get_colours works at) and
+    an optional preview tile are produced from the BGRA view without an
+    intermediate full-resolution BGR copy. When both are requested the
+    analysis tile is reduced from the preview tile, so the full frame is only
+    read once.
+    """
+    def __init__(self, analysis_size=(100, 100), preview_size=None):
+        self.analysis_size = analysis_size
+        self.preview_size = preview_size
+        self._analysis = None
+        self._preview = None
+
+    def _buffer(self, buf, size, channels):
+        width, height = size
+        if buf is None or buf.shape != (height, width, channels):
+            buf = np.empty((height, width, channels), dtype=np.uint8)
+        return buf
+
+    def __call__(self, frame):
+        """Return (analysis_tile, preview_tile), preview_tile is None when disabled."""
+        channels = frame.shape[2]
+        source = frame
+        preview = None
+        if self.preview_size is not None:
+            self._preview = self._buffer(self._preview, self.preview_size, channels)
+            preview = cv2.resize(frame, self.preview_size, dst=self._preview, interpolation=cv2.INTER_AREA)
+            source = preview
+
+        self._analysis = self._buffer(self._analysis, self.analysis_size, channels)
+        analysis = cv2.resize(source, self.analysis_size, dst=self._analysis, interpolation=cv2.INTER_AREA)
+        return analysis, preview
+
+
+class CaptureScheduler:
+    """
+    Shares one screen grab per tick between several regions of interest.
+
+    Regions are registered by name as mss style dicts ("top", "left", "width",
+    "height") with their own rate in Hz (None means every tick). Each tick grabs
+    the union bounding box of the regions that are due, or the whole monitor
+    when one is given, and hands out read-only BGRA slices of that single grab.
+    """
+    def __init__(self, sct, monitor=None):
+        self.sct = sct
+        self.monitor = monitor
+        self.regions = {}
+        self._next_due = {}
+
+    def register(self, name, region, rate=None):
+        self.regions[name] = (dict(region), None if rate is None else 1.0 / rate)
+        self._next_due[name] = 0.0
+
+    def unregister(self, name):
+        del self.regions[name]
+        del self._next_due[name]
+
+    def due(self, now):
+        return [name for name in self.regions if now >= self._next_due[name]]
+
+    def tick(self, now=None):
+        """Grab once and return {name: view} for every region that is due."""
+        now = monotonic() if now is None else now
+        names = self.due(now)
+        if not names:
+            return {}
+
+        boxes = [self.regions[name][0] for name in names]
+        if self.monitor is not None:
+            bbox = self.monitor
+        else:
+            left = min(b["left"] for b in boxes)
+            top = min(b["top"] for b in boxes)
+            bbox = {
+                "left": left,
+                "top": top,
+                "width": max(b["left"] + b["width"] for b in boxes) - left,
+                "height": max(b["top"] + b["height"] for b in boxes) - top,
+            }
+
+        grab = grab_bgra(self.sct, bbox)
+
+        views = {}
+        for name, box in zip(names, boxes):
+            x = box["left"] - bbox["left"]
+            y = box["top"] - bbox["top"]
+            views[name] = grab[y:y + box["height"], x:x + box["width"]]
+
+            interval = self.regions[name][1]
+            if interval is not None:
+                # Keep the cadence, but after a stall (or the first grab) start a fresh interval
+                nxt = self._next_due[name] + interval
+                self._next_due[name] = nxt if nxt > now else now + interval
+        return views
@@ -0,0 +1,44 @@
+from time import monotonic, sleep
+
+
+class CaptureClock:
+    """
+    Paces a loop to a target rate using monotonic deadlines.
+
+    tick() sleeps for whatever is left of the current period. When a tick is
+    more than a period late the overrun is counted and the schedule restarts
+    from now instead of bursting to catch up. With a demand event the clock
+    also waits for a consumer to ask for the next frame, rate then only caps
+    how often that can happen.
+    """
+    def __init__(self, rate=30.0, demand=None):
+        self.period = None if rate is None else 1.0 / rate
+        self.demand = demand
+        self.ticks = 0
+        self.overruns = 0
+        self._deadline = None
+
+    def tick(self):
+        if self.demand is not None:
+            self.demand.wait()
+            self.demand.clear()
+
+        now = monotonic()
+        if self.period is not None:
+            if self._deadline is None:
+                self._deadline = now
+            elif now < self._deadline:
+                sleep(self._deadline - now)
+            elif now - self._deadline > self.period:
+                # More than a full period late, drop the missed ticks
+                self.overruns += 1
+                self._deadline = now
+            self._deadline += self.period
+
+        self.ticks += 1
+        return self.ticks
+
+    def reset(self):
+        self.ticks = 0
+        self.overruns = 0
+        self._deadline = None
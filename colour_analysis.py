@@ -1,20 +1,93 @@
 from PIL import Image
+import cv2
 import numpy as np
 
-def analyze_colors(image_path):
-    # Open the image using Pillow
-    image = Image.open(image_path)
+def load_image(image):
+    """
+    Adapter for the analysis functions: file paths are decoded to an RGB
+    array, PIL images and arrays are used as they are. Results keep the
+    channel order of the input, so frames from the grabber stay BGR.
+    """
+    if isinstance(image, str):
+        # Convert in case the file has an alpha channel or a palette
+        image = Image.open(image).convert('RGB')
+    return np.asarray(image)
 
-    # Convert the image to a NumPy array for easy manipulation
-    image_array = np.array(image)
+def analyze_colors(image):
+    # Accept a path, a PIL image or an in-memory (H, W, 3/4) frame
+    image_array = load_image(image)
 
-    # Get the dimensions of the image
-    height, width, _ = image_array.shape
+    # Calculate the average color values, cv2.mean reads strided BGRA views without copying
+    average_color = np.array(cv2.mean(image_array)[:3])
 
-    # Reshape the array to a list of RGB values
-    rgb_values = image_array.reshape((height * width, 3))
+    return average_color
 
-    # Calculate the average color values
-    average_color = np.mean(rgb_values, axis=0)
+def pack_colors(arr, bits=8):
+    """
+    Pack the first three channels into one uint32 key per pixel, keeping the
+    top bits of each channel. Works in place on a single key array.
+    """
+    shift = 8 - bits
+    keys = arr[..., 0].astype(np.uint32)
+    keys >>= shift
+    for c in (1, 2):
+        keys <<= bits
+        keys |= arr[..., c] >> shift
+    return keys.ravel()
 
-    return average_color
+def unpack_colors(keys, dtype=np.uint8):
+    """Inverse of pack_colors for full 8 bit keys, returns (N, 3)."""
+    return np.stack([keys >> 16, (keys >> 8) & 0xFF, keys & 0xFF], axis=1).astype(dtype)
+
+def palette(img, top=None, bits=8, chunk=1 << 20):
+    """
+    Return palette in descending order of frequency
+
+    Colours are packed into integer keys. Exact counting (bits=8) sorts the
+    uint32 keys in place and takes run lengths, so beyond the key array itself
+    memory only grows with the number of distinct colours. bits < 8 quantises each
+    channel and counts in chunks of pixels, so memory stays bounded by the
+    bin count; each entry is then the mean colour of its bin. top limits the
+    result to the most frequent entries via argpartition.
+    """
+    arr = load_image(img)
+    # Alpha is constant on screen grabs and would only split identical colours
+    pixels = arr.reshape(-1, arr.shape[-1])
+    nbins = 1 << (3 * bits)
+
+    if bits == 8:
+        keys = pack_colors(pixels)
+        keys.sort()
+        # Mark the first key of every run of equal keys
+        first = np.empty(len(keys), dtype=bool)
+        first[:1] = True
+        np.not_equal(keys[1:], keys[:-1], out=first[1:])
+        present = keys[first]
+        n = len(keys)
+        del keys
+        counts = np.diff(np.flatnonzero(first), append=n)
+        del first
+        colors = None
+    else:
+        counts = np.zeros(nbins, dtype=np.int64)
+        sums = np.zeros((nbins, 3))
+        for start in range(0, len(pixels), chunk):
+            block = pixels[start:start + chunk]
+            keys = pack_colors(block, bits)
+            counts += np.bincount(keys, minlength=nbins)
+            for c in range(3):
+                sums[:, c] += np.bincount(keys, weights=block[:, c], minlength=nbins)
+        present = np.flatnonzero(counts)
+        counts = counts[present]
+        colors = (sums[present] / counts[:, None]).astype(arr.dtype)
+
+    # Only order the entries that are returned
+    if top is not None and top < len(counts):
+        selected = np.argpartition(-counts, top - 1)[:top]
+    else:
+        selected = np.arange(len(counts))
+    order = selected[np.argsort(-counts[selected], kind='stable')]
+
+    if colors is None:
+        return unpack_colors(present[order].astype(np.uint32), dtype=arr.dtype)
+    return colors[order]
@@ -0,0 +1,535 @@
+'''
+Dominant colour extractors.
+
+All extractors take a BGR or BGRA frame and return the dominant colours as
+[[b, g, r], ...], largest cluster first, like kmeans_get_colours. The
+per-frame models (TemporalKMeans, MiniBatchKMeansPalette) return the same
+thing as a (K, 3) uint8 array, so the steady-state loop never builds lists.
+'''
+from functools import lru_cache, partial
+from math import exp
+from time import monotonic
+
+import cv2
+import numpy as np
+
+from colour_analysis import analyze_colors, palette
+from colour_lut import bgr_to_lab, lab_to_bgr
+from sampling import PixelSampler, sampling_plan
+
+
+def tile_pixels(frame, size=(100, 100)):
+    """(N, 3) uint8 BGR pixels of frame at the analysis size, alpha dropped."""
+    if frame.shape[:2] != size[::-1]:
+        frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+    return frame[:, :, :3].reshape((-1, 3))
+
+
+def pad_colours(colors, K):
+    """Fewer distinct colours than K, repeat the last so callers always get K."""
+    colors = list(colors)
+    while len(colors) < K:
+        colors.append(colors[-1])
+    return colors
+
+
+def kmeans_get_colours(frame, K=3, samples=None, plan="stratified"):
+    # Convert image to data (resize to reduce complexity), dropping alpha on BGRA views
+    pixels = tile_pixels(frame)
+
+    # All pixels by default; otherwise a cached fixed plan, no per-frame shuffle
+    sampled_pixels = pixels
+    if samples is not None:
+        sampled_pixels = np.take(pixels, sampling_plan((100, 100), samples, plan), axis=0)
+
+    # Convert to np.float32
+    sampled_pixels = np.float32(sampled_pixels)
+
+    # Define criteria and apply kmeans()
+    criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 10, 1.0)
+    _, labels, centers = cv2.kmeans(sampled_pixels, K, None, criteria, 10, cv2.KMEANS_RANDOM_CENTERS)
+    
+    # Convert centers to integers
+    centers = np.uint8(centers)
+
+    # Identify the three most dominant colors based on the cluster sizes
+    cluster_sizes = np.bincount(labels.flatten())
+    dominant_idxs = np.argsort(-cluster_sizes)[:K]  # Get indexes of K largest clusters
+    
+    # Extract the colors corresponding to these indexes
+    dominant_colors = centers[dominant_idxs].tolist()
+
+    return dominant_colors
+
+
+@lru_cache(maxsize=None)
+def _bin_coords(bins):
+    # Bin grid coordinates, for the neighbourhood merge
+    return np.stack(np.unravel_index(np.arange(bins ** 3), (bins, bins, bins)), axis=1).astype(np.int16)
+
+
+@lru_cache(maxsize=None)
+def _box_offsets(radius):
+    # Every step within radius on each axis, the merge neighbourhood of a peak
+    steps = np.arange(-radius, radius + 1)
+    return np.stack(np.meshgrid(steps, steps, steps, indexing='ij'), axis=-1).reshape(-1, 3).astype(np.int16)
+
+
+def histogram_get_colours(frame, K=3, bins=16, merge_radius=1):
+    """
+    Dominant colours from a quantised bins^3 BGR histogram, in one pass.
+
+    Pixels are packed into a single bin index and counted with np.bincount,
+    along with per-bin channel sums so each peak reports the mean colour of
+    its pixels rather than the bin centre. Peaks are picked largest first,
+    absorbing every bin within merge_radius steps on each axis so one colour
+    spread over neighbouring bins counts once. Deterministic.
+    """
+    return batch_histogram_palettes(tile_pixels(frame)[None], K, bins, merge_radius)[0].tolist()
+
+
+def batch_histogram_palettes(frames, K=3, bins=16, merge_radius=1):
+    """
+    histogram_get_colours for a whole stack of frames at once.
+
+    frames is (B, H, W, 3/4) uint8 (or (B, N, 3/4) pixels), already at the
+    analysis size. Bin indices are offset by frame * bins^3 so a single
+    np.bincount builds all B histograms, and peak picking runs on the
+    (B, bins^3) counts together. Returns (B, K, 3) uint8.
+    """
+    if bins < 1 or bins > 256 or bins & (bins - 1):
+        raise ValueError(f"bins must be a power of two up to 256, got {bins}")
+    B = len(frames)
+    nbins = bins ** 3
+    pixels = frames.reshape(B, -1, frames.shape[-1])[:, :, :3]
+
+    shift = 8 - (int(bins).bit_length() - 1)
+    q = pixels >> shift
+    index = q[:, :, 0].astype(np.int32)
+    index *= bins
+    index += q[:, :, 1]
+    index *= bins
+    index += q[:, :, 2]
+    index += (np.arange(B, dtype=np.int32) * nbins)[:, None]
+    index = index.ravel()
+
+    counts = np.bincount(index, minlength=B * nbins).reshape(B, nbins).astype(np.float64)
+    flat = pixels.reshape(-1, 3)
+    sums = np.stack([np.bincount(index, weights=flat[:, c], minlength=B * nbins) for c in range(3)], axis=1)
+    sums = sums.reshape(B, nbins, 3)
+
+    coords = _bin_coords(bins)
+    offsets = _box_offsets(merge_radius)
+    rows = np.arange(B)[:, None]
+    colors = np.zeros((B, K, 3), dtype=np.uint8)
+    for k in range(K):
+        peak = counts.argmax(axis=1)
+        found = counts[rows[:, 0], peak] > 0
+
+        # Bins in the box around each frame's peak, out of range ones point back at the peak
+        neighbours = coords[peak][:, None, :] + offsets[None, :, :]
+        valid = ((neighbours >= 0) & (neighbours < bins)).all(axis=2)
+        idx = (neighbours[:, :, 0].astype(np.intp) * bins + neighbours[:, :, 1]) * bins + neighbours[:, :, 2]
+        idx = np.where(valid, idx, peak[:, None])
+        # Bins already taken by an earlier peak have a zero count and don't count again
+        weights = np.where(valid, counts[rows, idx] > 0, False)
+
+        total = np.maximum((counts[rows, idx] * weights).sum(axis=1), 1)
+        mean = (sums[rows, idx] * weights[:, :, None]).sum(axis=1) / total[:, None]
+        # Fewer distinct colours than K, repeat the previous one
+        previous = colors[:, k - 1] if k else colors[:, 0]
+        colors[:, k] = np.where(found[:, None], np.uint8(mean), previous)
+        counts[rows, idx] = 0
+    return colors
+
+
+class _VBox:
+    """MMCQ box over the 32^3 RGB histogram, bounds inclusive."""
+    __slots__ = ("bounds", "hist", "_count")
+
+    def __init__(self, bounds, hist):
+        self.bounds = [int(v) for v in bounds]  # [r1, r2, g1, g2, b1, b2]
+        self.hist = hist
+        self._count = None
+
+    def view(self):
+        r1, r2, g1, g2, b1, b2 = self.bounds
+        return self.hist[r1:r2 + 1, g1:g2 + 1, b1:b2 + 1]
+
+    @property
+    def count(self):
+        if self._count is None:
+            self._count = int(self.view().sum())
+        return self._count
+
+    @property
+    def volume(self):
+        r1, r2, g1, g2, b1, b2 = self.bounds
+        return (r2 - r1 + 1) * (g2 - g1 + 1) * (b2 - b1 + 1)
+
+    def copy(self):
+        return _VBox(self.bounds, self.hist)
+
+    def avg(self):
+        mult = 1 << (8 - _MMCQ_SIGBITS)
+        box = self.view()
+        ntot = box.sum()
+        avg = []
+        for axis in range(3):
+            lo, hi = self.bounds[2 * axis], self.bounds[2 * axis + 1]
+            if ntot:
+                marginal = box.sum(axis=tuple(a for a in range(3) if a != axis))
+                avg.append(int((marginal * (np.arange(lo, hi + 1) + 0.5) * mult).sum() / ntot))
+            else:
+                # Empty boxes at the top edge would give 256 like ColorThief does, keep it a uint8
+                avg.append(min(int(mult * (lo + hi + 1) / 2), 255))
+        return avg
+
+
+_MMCQ_SIGBITS = 5
+_MMCQ_MAX_ITERATION = 1000
+_MMCQ_FRACT_BY_POPULATIONS = 0.75
+
+
+class _PQueue:
+    # Same ordering rules as ColorThief's queue (stable sort, pop the largest)
+    def __init__(self, sort_key):
+        self.sort_key = sort_key
+        self.contents = []
+        self._sorted = False
+
+    def push(self, o):
+        self.contents.append(o)
+        self._sorted = False
+
+    def pop(self):
+        if not self._sorted:
+            self.contents.sort(key=self.sort_key)
+            self._sorted = True
+        return self.contents.pop()
+
+    def size(self):
+        return len(self.contents)
+
+
+def _median_cut_apply(vbox):
+    if not vbox.count:
+        return None, None
+    if vbox.count == 1:
+        return vbox.copy(), None
+
+    # Cut along the longest side, first axis wins ties
+    widths = [vbox.bounds[2 * a + 1] - vbox.bounds[2 * a] + 1 for a in range(3)]
+    axis = widths.index(max(widths))
+    lo, hi = vbox.bounds[2 * axis], vbox.bounds[2 * axis + 1]
+
+    marginal = vbox.view().sum(axis=tuple(a for a in range(3) if a != axis))
+    partialsum = np.cumsum(marginal)
+    total = int(partialsum[-1])
+    lookaheadsum = total - partialsum
+
+    def partial(i):
+        return int(partialsum[i - lo]) if lo <= i <= hi else 0
+
+    def lookahead(i):
+        return int(lookaheadsum[i - lo]) if lo <= i <= hi else 0
+
+    i = lo + int(np.argmax(partialsum > total / 2))
+    left = i - lo
+    right = hi - i
+    if left <= right:
+        d2 = min(hi - 1, int(i + right / 2))
+    else:
+        d2 = max(lo, int(i - 1 - left / 2))
+    # avoid 0-count boxes
+    while not partial(d2):
+        d2 += 1
+    count2 = lookahead(d2)
+    while not count2 and partial(d2 - 1):
+        d2 -= 1
+        count2 = lookahead(d2)
+
+    vbox1, vbox2 = vbox.copy(), vbox.copy()
+    vbox1.bounds[2 * axis + 1] = d2
+    vbox2.bounds[2 * axis] = d2 + 1
+    return vbox1, vbox2
+
+
+def mmcq_palette(frame, color_count=10, stride=10):
+    """
+    Modified median cut palette, the algorithm ColorThief uses, on a frame.
+
+    Takes every stride-th pixel (ColorThief's quality) of a BGR/BGRA frame,
+    skips near-white pixels like ColorThief does (unless nothing else is left,
+    where ColorThief would raise) and returns up to color_count
+    colours as [[b, g, r], ...] in ColorThief's palette order. The histogram
+    and box statistics are NumPy reductions, only the handful of box splits
+    run in Python. Alpha is ignored, it isn't reliable on screen grabs.
+    """
+    if color_count < 2 or color_count > 256:
+        raise ValueError("color_count must be between 2 and 256")
+
+    channels = frame.shape[2]
+    pixels = frame.reshape(-1, channels)[::stride, :3]
+    kept = pixels[~(pixels > 250).all(axis=1)]
+    # An all-white frame (slide, flash) is valid input, quantise the whites rather than fail
+    pixels = kept if len(kept) else pixels
+    if not len(pixels):
+        raise ValueError("No pixels to quantize")
+
+    # RGB order histogram so axis tie-breaks match ColorThief
+    q = pixels[:, ::-1] >> (8 - _MMCQ_SIGBITS)
+    side = 1 << _MMCQ_SIGBITS
+    index = (q[:, 0].astype(np.intp) * side + q[:, 1]) * side + q[:, 2]
+    hist = np.bincount(index, minlength=side ** 3).reshape(side, side, side)
+
+    lows, highs = q.min(axis=0), q.max(axis=0)
+    vbox = _VBox([lows[0], highs[0], lows[1], highs[1], lows[2], highs[2]], hist)
+
+    def iterate(queue, target):
+        n_color = 1
+        n_iter = 0
+        while n_iter < _MMCQ_MAX_ITERATION:
+            box = queue.pop()
+            if not box.count:
+                queue.push(box)
+                n_iter += 1
+                continue
+            box1, box2 = _median_cut_apply(box)
+            if box1 is None:
+                raise RuntimeError("Median cut produced no box")
+            queue.push(box1)
+            if box2 is not None:
+                queue.push(box2)
+                n_color += 1
+            if n_color >= target:
+                return
+            n_iter += 1
+
+    # First split by population, then by population times volume
+    queue = _PQueue(lambda box: box.count)
+    queue.push(vbox)
+    iterate(queue, _MMCQ_FRACT_BY_POPULATIONS * color_count)
+
+    queue2 = _PQueue(lambda box: box.count * box.volume)
+    while queue.size():
+        queue2.push(queue.pop())
+    iterate(queue2, color_count - queue2.size())
+
+    boxes = []
+    while queue2.size():
+        boxes.append(queue2.pop())
+    return [box.avg()[::-1] for box in boxes]
+
+
+def mmcq_get_colours(frame, K=3, stride=1):
+    """mmcq_palette as a K colour extractor on the analysis tile."""
+    tile = frame if frame.shape[:2] == (100, 100) else cv2.resize(frame, (100, 100), interpolation=cv2.INTER_AREA)
+    return pad_colours(mmcq_palette(tile, color_count=max(K, 2), stride=stride)[:K], K)
+
+
+class TemporalKMeans:
+    """
+    k-means that carries its clusters from one frame to the next.
+
+    Each frame is clustered with a single attempt, seeded by assigning the
+    pixels to the previous frame's centres. When the seeded fit is much worse
+    than the last one (a scene cut) or a restart is requested, it falls back to
+    a full multi-attempt clustering. Cluster i keeps its identity while the
+    scene is stable, see centers and sizes.
+
+    space="lab" clusters in 8-bit CIELab (via colour_lut) so distances follow
+    perceived colour difference; centers are then Lab, the returned palette BGR.
+    """
+    def __init__(self, K=3, size=(100, 100), attempts=10, cut_ratio=2.0, cut_margin=100.0, space="bgr"):
+        if space not in ("bgr", "lab"):
+            raise ValueError(f"Unknown colour space {space!r}, expected 'bgr' or 'lab'")
+        self.K = K
+        self.size = size
+        self.space = space
+        self.attempts = attempts
+        self.cut_ratio = cut_ratio
+        self.cut_margin = cut_margin
+        self.criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 10, 1.0)
+
+        self.centers = None
+        self.sizes = None
+        self.restarts = 0
+        self._compactness = None
+        # cv2.kmeans only takes float32, the conversion goes into one reused buffer
+        self._pixels = np.empty((size[0] * size[1], 3), dtype=np.float32)
+
+    def _assign(self, pixels):
+        # |p - c|^2 = |p|^2 - 2 p.c + |c|^2, one (N, K) product instead of an (N, K, 3) temporary
+        dists = pixels @ (-2.0 * self.centers.T)
+        dists += (self.centers ** 2).sum(axis=1)
+        labels = dists.argmin(axis=1).astype(np.int32)
+        nearest = np.take_along_axis(dists, labels[:, None], axis=1)
+        return labels, float(nearest.sum() + np.einsum('ij,ij->', pixels, pixels))
+
+    def reset(self):
+        self.centers = None
+        self.sizes = None
+        self._compactness = None
+
+    def __call__(self, frame, restart=False):
+        pixels = tile_pixels(frame, self.size)
+        if self.space == "lab":
+            pixels = bgr_to_lab(pixels)
+        self._pixels[...] = pixels
+        pixels = self._pixels
+
+        seeded = False
+        if self.centers is not None and not restart:
+            labels, seed_compactness = self._assign(pixels)
+            # A fit far worse than last frame's means the old centres no longer describe the picture
+            limit = self.cut_ratio * self._compactness + self.cut_margin * len(pixels)
+            seeded = seed_compactness <= limit
+
+        if seeded:
+            compactness, labels, centers = cv2.kmeans(
+                pixels, self.K, labels.reshape(-1, 1), self.criteria, 1, cv2.KMEANS_USE_INITIAL_LABELS)
+        else:
+            self.restarts += 1
+            compactness, labels, centers = cv2.kmeans(
+                pixels, self.K, None, self.criteria, self.attempts, cv2.KMEANS_PP_CENTERS)
+
+        self._compactness = compactness
+        self.centers = centers
+        self.sizes = np.bincount(labels.ravel(), minlength=self.K)
+
+        dominant_idxs = np.argsort(-self.sizes)
+        if self.space == "lab":
+            return lab_to_bgr(centers[dominant_idxs])
+        return np.uint8(centers[dominant_idxs])
+
+
+class MiniBatchKMeansPalette:
+    """
+    Palette model kept across frames, updated by mini-batch k-means.
+
+    Every frame contributes sample_size pixels picked by a cached sampling
+    plan that rotates across the tile from frame to frame. Each centre moves
+    towards the mean of the samples assigned to it with its own learning
+    rate, the batch count over its running count. Counts decay by `decay`
+    per update so the model keeps following the picture; that decay is the
+    smoothing, roughly a window of 1 / (1 - decay) frames. With tau (seconds)
+    the decay instead comes from the monotonic time between updates,
+    exp(-dt / tau), so the window is tau seconds whatever the analysis rate.
+    centers and weights can be read at any time.
+    """
+    def __init__(self, K=3, sample_size=256, decay=0.9, size=(100, 100), plan="stratified", tau=None):
+        self.K = K
+        self.sample_size = sample_size
+        self.decay = decay
+        self.tau = tau
+        self.size = size
+        self.sampler = PixelSampler(size, sample_size, plan, rotate=True)
+
+        self.centers = None
+        self.counts = np.zeros(K)
+        self._timestamp = None
+
+    @property
+    def weights(self):
+        total = self.counts.sum()
+        return self.counts / total if total else self.counts
+
+    def reset(self):
+        self.centers = None
+        self.counts[:] = 0
+
+    def _decay(self, timestamp):
+        if self.tau is None:
+            return self.decay
+        if timestamp is None:
+            timestamp = monotonic()
+        last, self._timestamp = self._timestamp, timestamp
+        if self.tau <= 0:
+            return 0.0
+        if last is None:
+            return self.decay
+        return exp(-max(timestamp - last, 0.0) / self.tau)
+
+    def update(self, frame, timestamp=None):
+        pixels = tile_pixels(frame, self.size)
+        sample = np.float32(self.sampler(pixels))
+        decay = self._decay(timestamp)
+
+        if self.centers is None:
+            # Seed from the first sample with a single k-means++ run
+            criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 10, 1.0)
+            _, labels, centers = cv2.kmeans(sample, self.K, None, criteria, 1, cv2.KMEANS_PP_CENTERS)
+            self.centers = centers
+            self.counts = np.bincount(labels.ravel(), minlength=self.K).astype(np.float64)
+            return
+
+        dists = ((sample[:, None, :] - self.centers[None, :, :]) ** 2).sum(axis=2)
+        labels = dists.argmin(axis=1)
+        batch_counts = np.bincount(labels, minlength=self.K)
+        batch_sums = np.stack([np.bincount(labels, weights=sample[:, c], minlength=self.K) for c in range(3)], axis=1)
+
+        self.counts *= decay
+        self.counts += batch_counts
+        hit = batch_counts > 0
+        # Per-centre learning rate: this batch's share of the centre's running count
+        rate = batch_counts[hit] / self.counts[hit]
+        batch_means = batch_sums[hit] / batch_counts[hit, None]
+        self.centers[hit] += (rate[:, None] * (batch_means - self.centers[hit])).astype(np.float32)
+
+    def __call__(self, frame, timestamp=None):
+        self.update(frame, timestamp)
+        order = np.argsort(-self.counts)
+        return np.uint8(self.centers[order])
+
+
+def frequency_get_colours(frame, K=3):
+    """The K most frequent exact colours, colour_analysis.palette as an extractor."""
+    return pad_colours(palette(frame, top=K).tolist(), K)
+
+
+def mean_get_colours(frame, K=3):
+    """colour_analysis.analyze_colors, the frame mean repeated K times."""
+    return [np.uint8(analyze_colors(frame)).tolist()] * K
+
+
+def colorthief_get_colours(frame, K=3):
+    """
+    The original ColorThief path (JPEG encode, pure Python MMCQ), kept as a
+    reference for benchmarks. Needs the colorthief package.
+    """
+    from io import BytesIO
+
+    from colorthief import ColorThief
+    from PIL import Image
+
+    # ColorThief expects RGB
+    f = BytesIO()
+    Image.fromarray(np.ascontiguousarray(frame[:, :, 2::-1])).save(f, format='JPEG')
+    f.seek(0)
+    colors = ColorThief(f).get_palette(color_count=max(K, 2), quality=1)[:K]
+    return pad_colours([list(c[::-1]) for c in colors], K)
+
+
+# Strategy name -> factory returning a callable frame -> [[b, g, r], ...]
+EXTRACTORS = {
+    "kmeans": lambda K=3: partial(kmeans_get_colours, K=K),
+    "temporal-kmeans": lambda K=3: TemporalKMeans(K=K),
+    "temporal-kmeans-lab": lambda K=3: TemporalKMeans(K=K, space="lab"),
+    "histogram": lambda K=3: partial(histogram_get_colours, K=K),
+    "mmcq": lambda K=3: partial(mmcq_get_colours, K=K),
+    # Smooths across frames by itself, no separate moving average needed
+    "minibatch": lambda K=3: MiniBatchKMeansPalette(K=K),
+    "frequency": lambda K=3: partial(frequency_get_colours, K=K),
+    "mean": lambda K=3: partial(mean_get_colours, K=K),
+    "colorthief": lambda K=3: partial(colorthief_get_colours, K=K),
+}
+
+
+def make_extractor(strategy="temporal-kmeans", K=3):
+    """Build a dominant colour extractor by strategy name, see EXTRACTORS."""
+    try:
+        factory = EXTRACTORS[strategy]
+    except KeyError:
+        raise ValueError(f"Unknown colour extractor {strategy!r}, expected one of {sorted(EXTRACTORS)}")
+    return factory(K=K)
@@ -0,0 +1,66 @@
+'''
+Lookup tables for BGR -> CIELab / HSV on whole frames.
+
+Colours are quantised to 6 bits per channel (64^3 entries) and converted by a
+single np.take into a precomputed uint8 table, so converting a frame is one
+packed-index computation and one gather. Tables are built on first use with
+OpenCV's own conversions of the bin centres.
+
+Lab is OpenCV's 8-bit encoding (L * 255 / 100, a + 128, b + 128). HSV uses
+the full 0-255 hue range (COLOR_BGR2HSV_FULL).
+'''
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+LUT_BITS = 6
+
+
+@lru_cache(maxsize=None)
+def _table(code, bits=LUT_BITS):
+    side = 1 << bits
+    shift = 8 - bits
+    # Every quantised colour at the centre of its bin, as one (side^3, 1, 3) image
+    levels = (np.arange(side, dtype=np.uint16) << shift) + (1 << shift >> 1)
+    b, g, r = np.meshgrid(levels, levels, levels, indexing='ij')
+    colors = np.stack([b, g, r], axis=-1).reshape(-1, 1, 3).astype(np.uint8)
+    table = cv2.cvtColor(colors, code).reshape(-1, 3)
+    table.flags.writeable = False
+    return table
+
+
+def lut_index(frame, bits=LUT_BITS):
+    """Packed table index for every pixel of a BGR/BGRA frame (or (N, 3) pixels)."""
+    shift = 8 - bits
+    index = (frame[..., 0] >> shift).astype(np.int32)
+    index <<= bits
+    index |= frame[..., 1] >> shift
+    index <<= bits
+    index |= frame[..., 2] >> shift
+    return index
+
+
+def bgr_to_lab(frame):
+    """(..., 3/4) BGR(A) uint8 -> (..., 3) 8-bit Lab."""
+    return np.take(_table(cv2.COLOR_BGR2Lab), lut_index(frame), axis=0)
+
+
+def bgr_to_hsv(frame):
+    """(..., 3/4) BGR(A) uint8 -> (..., 3) HSV, all channels 0-255."""
+    return np.take(_table(cv2.COLOR_BGR2HSV_FULL), lut_index(frame), axis=0)
+
+
+def lab_to_bgr(colors):
+    """(N, 3) 8-bit Lab colours back to BGR, for cluster centres and the like."""
+    lab = np.clip(np.asarray(colors), 0, 255).astype(np.uint8).reshape(-1, 1, 3)
+    return cv2.cvtColor(lab, cv2.COLOR_Lab2BGR).reshape(-1, 3)
+
+
+def hsv_degrees(colors):
+    """
+    [[b, g, r], ...] -> (N, 3) int array of hue in degrees, saturation and
+    value in percent, the units rgb_to_hsv in working_v1 classifies with.
+    """
+    hsv = bgr_to_hsv(np.asarray(colors, dtype=np.uint8).reshape(-1, 3)).astype(np.int32)
+    return np.stack([hsv[:, 0] * 360 // 256, hsv[:, 1] * 100 // 255, hsv[:, 2] * 100 // 255], axis=1)
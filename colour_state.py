@@ -0,0 +1,178 @@
+import math
+import os
+from multiprocessing import shared_memory
+from time import monotonic, sleep
+
+import numpy as np
+
+from smoothing import PaletteSmoother
+
+
+class ColourState:
+    """
+    Latest analysis result in shared memory, for any number of readers.
+
+    One writer (the analysis process) publishes the current and the smoothed
+    palette, plus the smoother's own state when it is given one; displays,
+    renderers and light outputs attach by name and read whenever they like
+    without locks or a Manager round trip. With the smoother state published
+    a reader can evaluate the palette at its own timestamps (colors_at), like
+    PaletteSmoother.colors_at in the analysis process.
+
+    Consistency comes from a seqlock: the writer makes the counter odd,
+    writes, then makes it even again. A reader copies the whole block and
+    retries when the counter was odd or moved while it copied. If the writer
+    died mid-update the counter stays odd; after timeout seconds readers fall
+    back to their last good copy, or raise TimeoutError if they never had one.
+
+    Layout (8 byte aligned):
+        [0]        seqlock counter (int64, odd while a write is in progress)
+        [1]        sequence number of the published state (int64, -1 before the first)
+        [2]        monotonic timestamp of the publish (float64)
+        [3]        smoother tau (float64, NaN for fixed alpha)
+        [4]        smoother timestamp (float64)
+        [5]        smoother frac_bits (int64, 0 when no smoother was published)
+        [6:]       smoother slot ranks (int64, K), smoother state and target
+                   ((K, 3) int32 each), current then smoothed palette ((K, 3) uint8 each)
+    """
+    def __init__(self, num_colors=3, name=None, create=True):
+        self.num_colors = num_colors
+        K = num_colors
+        self._size = 8 * 6 + 8 * K + 2 * 12 * K + 2 * 3 * K
+
+        # Forked children inherit this object, only the creating process unlinks
+        self._owner_pid = os.getpid() if create else None
+        self._shm = shared_memory.SharedMemory(name=name, create=create, size=self._size if create else 0)
+        self._shared = self._map(self._shm.buf)
+
+        if create:
+            self._shm.buf[:self._size] = bytes(self._size)
+            self._shared["seq"][0] = -1
+
+        # Reader side: a scratch copy of the block and the last consistent one
+        self._scratch = None
+        self._good = None
+        self._have_good = False
+        self._smoother = None
+
+    def _map(self, buf):
+        K = self.num_colors
+        rank_at = 48
+        state_at = rank_at + 8 * K
+        target_at = state_at + 12 * K
+        palettes_at = target_at + 12 * K
+        return {
+            "lock": np.ndarray((1,), dtype=np.int64, buffer=buf, offset=0),
+            "seq": np.ndarray((1,), dtype=np.int64, buffer=buf, offset=8),
+            "stamp": np.ndarray((1,), dtype=np.float64, buffer=buf, offset=16),
+            "tau": np.ndarray((1,), dtype=np.float64, buffer=buf, offset=24),
+            "smoother_stamp": np.ndarray((1,), dtype=np.float64, buffer=buf, offset=32),
+            "frac_bits": np.ndarray((1,), dtype=np.int64, buffer=buf, offset=40),
+            "rank": np.ndarray((K,), dtype=np.int64, buffer=buf, offset=rank_at),
+            "state": np.ndarray((K, 3), dtype=np.int32, buffer=buf, offset=state_at),
+            "target": np.ndarray((K, 3), dtype=np.int32, buffer=buf, offset=target_at),
+            "palettes": np.ndarray((2, K, 3), dtype=np.uint8, buffer=buf, offset=palettes_at),
+        }
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    def __reduce__(self):
+        # Child processes re-attach to the same block
+        return (ColourState, (self.num_colors, self.name, False))
+
+    def publish(self, palette, smoothed, timestamp=None, smoother=None):
+        """Write a new state. Single writer only. Returns its sequence number."""
+        shared = self._shared
+        seq = int(shared["seq"][0]) + 1
+        shared["lock"][0] += 1
+        shared["palettes"][0] = palette
+        shared["palettes"][1] = smoothed
+        shared["stamp"][0] = monotonic() if timestamp is None else timestamp
+        if smoother is not None:
+            state, target, rank, smoother_stamp = smoother.save()
+            shared["state"][...] = state
+            shared["target"][...] = target
+            shared["rank"][...] = rank
+            shared["smoother_stamp"][0] = smoother_stamp if smoother_stamp is not None else 0.0
+            shared["tau"][0] = math.nan if smoother.tau is None else smoother.tau
+            shared["frac_bits"][0] = smoother.frac_bits
+        shared["seq"][0] = seq
+        shared["lock"][0] += 1
+        return seq
+
+    def latest(self):
+        """Sequence number of the newest published state, -1 if none yet."""
+        return int(self._shared["seq"][0])
+
+    def _snapshot(self, timeout):
+        """Views over the latest consistent copy of the whole block."""
+        if self._scratch is None:
+            # (bytes, views) pairs, swapped on every consistent copy
+            self._scratch = self._local_copy()
+            self._good = self._local_copy()
+
+        lock = self._shared["lock"]
+        deadline = monotonic() + timeout
+        while True:
+            before = int(lock[0])
+            if not before & 1:
+                self._scratch[0][:] = self._shm.buf[:self._size]
+                if int(lock[0]) == before:
+                    self._scratch, self._good = self._good, self._scratch
+                    self._have_good = True
+                    return self._good[1]
+            if monotonic() > deadline:
+                if not self._have_good:
+                    raise TimeoutError("Colour state writer stalled mid-update")
+                # Writer gone or stuck, keep serving the last consistent copy
+                return self._good[1]
+            # Writer is mid-update, it only takes microseconds
+            sleep(0)
+
+    def _local_copy(self):
+        buf = bytearray(self._size)
+        return buf, self._map(buf)
+
+    def read(self, palette=None, smoothed=None, timeout=0.05):
+        """
+        Consistent copy of the state as (seq, timestamp, palette, smoothed).
+        Pass (K, 3) uint8 arrays to copy into them instead of allocating.
+        """
+        if palette is None:
+            palette = np.empty((self.num_colors, 3), dtype=np.uint8)
+        if smoothed is None:
+            smoothed = np.empty((self.num_colors, 3), dtype=np.uint8)
+
+        copy = self._snapshot(timeout)
+        palette[...] = copy["palettes"][0]
+        smoothed[...] = copy["palettes"][1]
+        return int(copy["seq"][0]), float(copy["stamp"][0]), palette, smoothed
+
+    def colors_at(self, t=None, timeout=0.05):
+        """
+        The smoothed palette at monotonic time t (default now), interpolated
+        from the published smoother state. Falls back to the published
+        smoothed palette when the writer doesn't publish its smoother. The
+        returned (K, 3) uint8 array is reused between calls.
+        """
+        copy = self._snapshot(timeout)
+        frac_bits = int(copy["frac_bits"][0])
+        if copy["seq"][0] < 0 or not frac_bits:
+            return copy["palettes"][1].copy()
+
+        tau = float(copy["tau"][0])
+        tau = None if math.isnan(tau) else tau
+        if self._smoother is None or self._smoother.frac_bits != frac_bits:
+            self._smoother = PaletteSmoother(num_colors=self.num_colors, frac_bits=frac_bits)
+        self._smoother.tau = tau
+        self._smoother.load(copy["state"], copy["target"], copy["rank"], float(copy["smoother_stamp"][0]))
+        return self._smoother.colors_at(t)
+
+    def close(self):
+        # Drop the views before releasing the mapping
+        del self._shared
+        self._shm.close()
+        if self._owner_pid == os.getpid():
+            self._shm.unlink()
@@ -0,0 +1,96 @@
+import os
+from multiprocessing import shared_memory
+from time import monotonic
+
+import numpy as np
+
+
+class FrameRing:
+    """
+    Ring of preallocated frame slots in shared memory.
+
+    One writer copies each frame into the next slot and publishes its sequence
+    number, readers attach by name and map slots as NumPy views, so only the
+    sequence number crosses process boundaries.
+
+    Header layout (int64/float64, 8 byte aligned):
+        [0]            latest published sequence (-1 before the first write)
+        [1 : 1+N]      sequence held by each slot (-1 while being written)
+        [1+N : 1+2N]   capture timestamp of each slot (float64, time.monotonic)
+    """
+    _ALIGN = 64
+
+    def __init__(self, shape, slots=4, name=None, create=True):
+        self.shape = tuple(shape)
+        self.slots = slots
+        self._frame_bytes = int(np.prod(self.shape))
+
+        header_bytes = 8 * (1 + 2 * slots)
+        self._data_offset = -(-header_bytes // self._ALIGN) * self._ALIGN
+        size = self._data_offset + slots * self._frame_bytes
+
+        # Forked children inherit this object, only the creating process unlinks
+        self._owner_pid = os.getpid() if create else None
+        self._shm = shared_memory.SharedMemory(name=name, create=create, size=size if create else 0)
+        self._map()
+
+        if create:
+            self._latest[0] = -1
+            self._seqs[:] = -1
+            self._stamps[:] = 0.0
+
+    def _map(self):
+        buf = self._shm.buf
+        self._latest = np.ndarray((1,), dtype=np.int64, buffer=buf, offset=0)
+        self._seqs = np.ndarray((self.slots,), dtype=np.int64, buffer=buf, offset=8)
+        self._stamps = np.ndarray((self.slots,), dtype=np.float64, buffer=buf, offset=8 * (1 + self.slots))
+        self._frames = np.ndarray((self.slots, *self.shape), dtype=np.uint8, buffer=buf, offset=self._data_offset)
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    def __reduce__(self):
+        # Child processes re-attach to the same block instead of pickling frames
+        return (FrameRing, (self.shape, self.slots, self.name, False))
+
+    def write(self, frame, timestamp=None):
+        """Copy frame into the next slot and publish it. Returns its sequence number."""
+        seq = int(self._latest[0]) + 1
+        slot = seq % self.slots
+
+        self._seqs[slot] = -1
+        self._frames[slot] = frame
+        self._stamps[slot] = monotonic() if timestamp is None else timestamp
+        self._seqs[slot] = seq
+        self._latest[0] = seq
+        return seq
+
+    def latest(self):
+        """Sequence number of the newest complete frame, -1 if none yet."""
+        return int(self._latest[0])
+
+    def read(self, seq):
+        """
+        Return (view, timestamp) for seq without copying, or (None, None)
+        if that frame has already been overwritten.
+        """
+        if seq < 0:
+            return None, None
+        slot = seq % self.slots
+        if self._seqs[slot] != seq:
+            return None, None
+        view = self._frames[slot]
+        view.flags.writeable = False
+        return view, float(self._stamps[slot])
+
+    def is_valid(self, seq):
+        """True while seq has not been recycled by the writer, check after using a view."""
+        return seq >= 0 and self._seqs[seq % self.slots] == seq
+
+    def close(self):
+        # Drop the views before releasing the mapping
+        del self._latest, self._seqs, self._stamps, self._frames
+        self._shm.close()
+        if self._owner_pid == os.getpid():
+            self._shm.unlink()
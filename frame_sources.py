@@ -0,0 +1,199 @@
+'''
+Frame sources for the analysis pipeline.
+
+Every source returns uint8 frames in OpenCV channel order, (H, W, 3) BGR or
+(H, W, 4) BGRA, and None once it is exhausted. Frames may be read-only views
+that are only valid until the next read().
+
+A source keeps one frame shape for its whole life, so consumers can size
+shared rings and recordings from the first frame.
+'''
+import glob
+
+import cv2
+import numpy as np
+
+from capture import grab_bgra
+
+
+class FrameSource:
+    def read(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __iter__(self):
+        while True:
+            frame = self.read()
+            if frame is None:
+                return
+            yield frame
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class MSSSource(FrameSource):
+    """Screen region through mss, BGRA views over the grab buffer."""
+    def __init__(self, monitor):
+        import mss
+        self.monitor = monitor
+        self.sct = mss.mss()
+
+    def read(self):
+        return grab_bgra(self.sct, self.monitor)
+
+    def close(self):
+        self.sct.close()
+
+
+class ImageGrabSource(FrameSource):
+    """Screen region through PIL.ImageGrab, bbox is (x, y, x2, y2)."""
+    def __init__(self, bbox=None):
+        from PIL import ImageGrab
+        self._grab = ImageGrab.grab
+        self.bbox = bbox
+
+    def read(self):
+        rgb = np.asarray(self._grab(bbox=self.bbox).convert("RGB"))
+        return cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
+
+
+class VideoFileSource(FrameSource):
+    """Decoded frames from a video file, optionally looping."""
+    def __init__(self, path, loop=False):
+        self.path = path
+        self.loop = loop
+        self.cap = cv2.VideoCapture(path)
+        if not self.cap.isOpened():
+            raise IOError(f"Could not open video {path}")
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS)
+
+    def read(self):
+        status, frame = self.cap.read()
+        if not status and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            status, frame = self.cap.read()
+        return frame if status else None
+
+    def close(self):
+        self.cap.release()
+
+
+class ImageDirectorySource(FrameSource):
+    """
+    Still images matching a glob pattern, e.g. "images/scored*.png".
+    Images are decoded once and cycled when loop is set. Every image is
+    resized to size (width, height), by default the first image's size.
+    """
+    def __init__(self, pattern, loop=True, size=None):
+        paths = sorted(glob.glob(pattern))
+        if not paths:
+            raise IOError(f"No images match {pattern}")
+        self.frames = []
+        for path in paths:
+            frame = cv2.imread(path, cv2.IMREAD_COLOR)
+            if frame is None:
+                raise IOError(f"Could not read image {path}")
+            if size is None:
+                size = (frame.shape[1], frame.shape[0])
+            if frame.shape[1::-1] != tuple(size):
+                frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+            frame.flags.writeable = False
+            self.frames.append(frame)
+        self.loop = loop
+        self._index = 0
+
+    def read(self):
+        if self._index >= len(self.frames):
+            if not self.loop:
+                return None
+            self._index = 0
+        frame = self.frames[self._index]
+        self._index += 1
+        return frame
+
+
+class SyntheticSource(FrameSource):
+    """
+    Deterministic test pattern: a scrolling gradient with a few colour blocks
+    that switch palette every scene_length frames, so both smooth motion and
+    scene cuts are exercised. Same seed, same frames.
+    """
+    def __init__(self, width=400, height=300, frames=None, scene_length=90, seed=0):
+        self.width = width
+        self.height = height
+        self.frames = frames
+        self.scene_length = scene_length
+        self.seed = seed
+        self._index = 0
+        self._frame = np.empty((height, width, 3), dtype=np.uint8)
+
+        ys, xs = np.mgrid[0:height, 0:width]
+        self._ramp = ((xs + ys) * 255 // (width + height)).astype(np.uint8)
+
+    def _palette(self, scene):
+        rng = np.random.default_rng((self.seed, scene))
+        return rng.integers(0, 256, size=(3, 3), dtype=np.uint8)
+
+    def read(self):
+        if self.frames is not None and self._index >= self.frames:
+            return None
+        index = self._index
+        self._index += 1
+
+        palette = self._palette(index // self.scene_length)
+        shift = (index * 4) % 256
+        ramp = self._ramp + np.uint8(shift)
+
+        frame = self._frame
+        frame[...] = ramp[:, :, None]
+        frame[:, :, 0] = frame[:, :, 0] // 2 + palette[0, 0] // 2
+
+        # Three blocks of solid colour taking most of the frame
+        block = self.width // 3
+        top, bottom = self.height // 4, self.height * 3 // 4
+        for i in range(3):
+            frame[top:bottom, i * block:(i + 1) * block] = palette[i]
+        return frame
+
+
+def open_source(spec, monitor=None):
+    """
+    Build a source from a spec string:
+        mss                  screen region given by monitor
+        imagegrab            screen region given by monitor, via PIL
+        video:PATH           video file (video-loop:PATH to repeat)
+        images:GLOB          still images, cycled
+        synthetic[:WxH]      deterministic test pattern
+        replay:PATH          recorded session, as fast as possible
+        replay-realtime:PATH recorded session, paced to its timestamps
+    """
+    kind, _, arg = spec.partition(":")
+    if kind == "mss":
+        return MSSSource(monitor)
+    if kind == "imagegrab":
+        bbox = None
+        if monitor is not None:
+            bbox = (monitor["left"], monitor["top"],
+                    monitor["left"] + monitor["width"], monitor["top"] + monitor["height"])
+        return ImageGrabSource(bbox)
+    if kind == "video":
+        return VideoFileSource(arg)
+    if kind == "video-loop":
+        return VideoFileSource(arg, loop=True)
+    if kind == "images":
+        return ImageDirectorySource(arg)
+    if kind == "synthetic":
+        if arg:
+            width, height = (int(v) for v in arg.lower().split("x"))
+            return SyntheticSource(width, height)
+        return SyntheticSource()
+    if kind in ("replay", "replay-realtime"):
+        from recording import ReplaySource
+        return ReplaySource(arg, realtime=kind == "replay-realtime")
+    raise ValueError(f"Unknown frame source {spec!r}")
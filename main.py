@@ -1,42 +1,77 @@
+import argparse
+
+import cv2
 from mss import mss
-from colour_analysis import analyze_colors
-
-# Save a screenshot of the 1st monitor
-with mss() as sct:
-    sct.shot(output='screenshot.png')
-
-# Perform color analysis on the screenshot
-screenshot_path = 'screenshot.png'
-average_color = analyze_colors(screenshot_path)
-
-print(f'Average Color: {average_color}')
-
-import numpy as np
-from PIL import Image
-
-def palette(img):
-    """
-    Return palette in descending order of frequency
-    """
-    arr = np.asarray(img)
-    palette, index = np.unique(asvoid(arr).ravel(), return_inverse=True)
-    palette = palette.view(arr.dtype).reshape(-1, arr.shape[-1])
-    count = np.bincount(index)
-    order = np.argsort(count)
-    return palette[order[::-1]]
-
-def asvoid(arr):
-    """View the array as dtype np.void (bytes)
-    This collapses ND-arrays to 1D-arrays, so you can perform 1D operations on them.
-    http://stackoverflow.com/a/16216866/190597 (Jaime)
-    http://stackoverflow.com/a/16840350/190597 (Jaime)
-    Warning:
-    >>> asvoid([-0.]) == asvoid([0.])
-    array([False], dtype=bool)
-    """
-    arr = np.ascontiguousarray(arr)
-    return arr.view(np.dtype((np.void, arr.dtype.itemsize * arr.shape[-1])))
-
-
-img = Image.open(screenshot_path, "r").convert('RGB')
-print(palette(img)[:3])
\ No newline at end of file
+
+from capture import grab_bgra
+from capture_clock import CaptureClock
+from colour_analysis import analyze_colors, load_image, palette
+from zone_colours import ZoneGrid
+
+
+def report(image, rgb=False, zones=None):
+    """Print the average colour and top palette entries (or per-zone colours), in RGB order."""
+    if zones is not None:
+        means, dominant = zones(image)
+        if not rgb:
+            means, dominant = means[:, ::-1], dominant[:, ::-1]
+        print('Zone means:', means.tolist())
+        print('Zone dominant:', dominant.tolist())
+        return
+
+    average_color = analyze_colors(image)
+    top_colors = palette(image, top=3)
+    if not rgb:
+        # Grabbed frames are BGR(A)
+        average_color = average_color[::-1]
+        top_colors = top_colors[:, ::-1]
+
+    print(f'Average Color: {average_color}')
+    print(top_colors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Colour analysis of the 1st monitor")
+    parser.add_argument("--image", metavar="PATH", help="analyse an image file instead of the screen")
+    parser.add_argument("--continuous", action="store_true", help="keep grabbing and analysing")
+    parser.add_argument("--fps", type=float, default=None, help="cap the continuous analysis rate")
+    parser.add_argument("--zones", metavar="COLSxROWS", help="per-zone colours of a grid, e.g. 8x4")
+    parser.add_argument("--border", action="store_true", help="with --zones, only the outer ring of zones")
+    parser.add_argument("--save", metavar="PATH",
+                        help="also write the grabbed frame to an image file (the last one with --continuous)")
+    args = parser.parse_args()
+
+    zones = None
+    if args.zones:
+        cols, rows = (int(v) for v in args.zones.lower().split("x"))
+        zones = ZoneGrid(cols, rows, border=args.border)
+
+    if args.image:
+        # File paths go through the PIL adapter and come back as RGB
+        report(load_image(args.image) if zones else args.image, rgb=True, zones=zones)
+        return
+
+    # Analyse the grabbed frame in memory, no screenshot.png round trip
+    with mss() as sct:
+        monitor = sct.monitors[1]
+        if not args.continuous:
+            frame = grab_bgra(sct, monitor)
+            report(frame, zones=zones)
+        else:
+            frame = None
+            clock = CaptureClock(args.fps)
+            try:
+                while True:
+                    clock.tick()
+                    frame = grab_bgra(sct, monitor)
+                    report(frame, zones=zones)
+            except KeyboardInterrupt:
+                pass
+
+        if args.save and frame is not None:
+            # Encoded once on the way out, not per frame; drop the unused alpha
+            cv2.imwrite(args.save, cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+'''
+Raw frame recordings for reproducible benchmarks.
+
+A session is three files next to each other:
+    NAME          fixed-shape uint8 frames, back to back (np.memmap)
+    NAME.ts       float64 monotonic capture timestamps, one per frame
+    NAME.json     shape and frame count
+'''
+import json
+import os
+from time import monotonic, sleep
+
+import numpy as np
+
+from frame_sources import FrameSource
+
+
+class FrameRecorder:
+    """
+    Appends frames to a memory-mapped session file. The file grows by doubling
+    its capacity, so recording never decodes or encodes anything.
+    """
+    def __init__(self, path, shape, capacity=256):
+        self.path = path
+        self.shape = tuple(shape)
+        self.count = 0
+        self._capacity = 0
+        self._frames = None
+        self._stamps = None
+
+        # Start from empty files
+        for name in (path, path + ".ts"):
+            open(name, "wb").close()
+        self._grow(capacity)
+
+    def _grow(self, capacity):
+        frame_bytes = int(np.prod(self.shape))
+        self._frames = self._stamps = None
+        os.truncate(self.path, capacity * frame_bytes)
+        os.truncate(self.path + ".ts", capacity * 8)
+        self._frames = np.memmap(self.path, dtype=np.uint8, mode="r+", shape=(capacity, *self.shape))
+        self._stamps = np.memmap(self.path + ".ts", dtype=np.float64, mode="r+", shape=(capacity,))
+        self._capacity = capacity
+
+    def write(self, frame, timestamp=None):
+        if frame.shape != self.shape:
+            raise ValueError(f"Frame shape {frame.shape} does not match recording shape {self.shape}")
+        if self.count == self._capacity:
+            self._frames.flush()
+            self._stamps.flush()
+            self._grow(self._capacity * 2)
+
+        self._frames[self.count] = frame
+        self._stamps[self.count] = monotonic() if timestamp is None else timestamp
+        self.count += 1
+
+    def close(self):
+        if self._frames is None:
+            return
+        frame_bytes = int(np.prod(self.shape))
+        self._frames.flush()
+        self._stamps.flush()
+        self._frames = self._stamps = None
+
+        # Trim the unused capacity and write the index
+        os.truncate(self.path, self.count * frame_bytes)
+        os.truncate(self.path + ".ts", self.count * 8)
+        with open(self.path + ".json", "w") as f:
+            json.dump({"shape": list(self.shape), "count": self.count}, f)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def load_recording(path):
+    """Read-only (frames, timestamps) memmaps of a recorded session."""
+    with open(path + ".json") as f:
+        meta = json.load(f)
+    count, shape = meta["count"], tuple(meta["shape"])
+    if count == 0:
+        return np.empty((0, *shape), dtype=np.uint8), np.empty(0)
+    frames = np.memmap(path, dtype=np.uint8, mode="r", shape=(count, *shape))
+    stamps = np.memmap(path + ".ts", dtype=np.float64, mode="r", shape=(count,))
+    return frames, stamps
+
+
+class ReplaySource(FrameSource):
+    """
+    Replays a recorded session as zero-copy memmap slices, either as fast as
+    the consumer reads or paced to the recorded timestamps.
+    """
+    def __init__(self, path, realtime=False, loop=False):
+        self.frames, self.stamps = load_recording(path)
+        self.realtime = realtime
+        self.loop = loop
+        self._index = 0
+        self._start = None
+
+    def read(self):
+        if self._index >= len(self.frames):
+            if not self.loop or len(self.frames) == 0:
+                return None
+            self._index = 0
+            self._start = None
+
+        if self.realtime:
+            now = monotonic()
+            if self._start is None:
+                self._start = now - (self.stamps[self._index] - self.stamps[0])
+            delay = self._start + (self.stamps[self._index] - self.stamps[0]) - now
+            if delay > 0:
+                sleep(delay)
+
+        frame = self.frames[self._index]
+        self._index += 1
+        return frame
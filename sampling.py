@@ -0,0 +1,82 @@
+'''
+Precomputed pixel sampling plans for the extractors.
+
+A plan is a fixed, sorted set of flat pixel indices into a (height, width)
+tile, built once per (size, count, kind) and cached, so sampling in the hot
+loop is one np.take with no RNG or permutation. Plans are deterministic, which
+keeps benchmark runs reproducible.
+
+    strided     every (N / count)-th pixel in raster order
+    stratified  one pixel per cell of a near-square grid, jittered with a fixed seed
+    blue-noise  the R2 low-discrepancy sequence, evenly spread with no grid pattern
+'''
+from functools import lru_cache
+
+import numpy as np
+
+PLAN_KINDS = ("strided", "stratified", "blue-noise")
+
+# Inverse golden ratio, also the rotation step as a fraction of the plan spacing
+_GOLDEN = 0.6180339887498949
+# Inverses of the plastic number, the R2 sequence's per-axis steps
+_R2 = (0.7548776662466927, 0.5698402909980532)
+
+
+@lru_cache(maxsize=None)
+def sampling_plan(size, count, kind="stratified"):
+    """Read-only sorted intp indices of count pixels in a (width, height) tile."""
+    width, height = size
+    n = width * height
+    count = min(count, n)
+
+    if kind == "strided":
+        index = np.arange(count) * n // count
+    elif kind == "stratified":
+        cols = max(1, int(round(np.sqrt(count * width / height))))
+        rows = -(-count // cols)
+        rng = np.random.default_rng(0)
+        x = (np.arange(cols) + rng.random((rows, cols))) * width / cols
+        y = (np.arange(rows)[:, None] + rng.random((rows, cols))) * height / rows
+        cells = (y.astype(np.intp) * width + x.astype(np.intp)).ravel()
+        # Spread the count picks over all rows * cols cells instead of dropping the last row
+        index = cells[np.arange(count) * len(cells) // count]
+    elif kind == "blue-noise":
+        k = np.arange(1, count + 1)
+        x = ((0.5 + _R2[0] * k) % 1.0) * width
+        y = ((0.5 + _R2[1] * k) % 1.0) * height
+        index = y.astype(np.intp) * width + x.astype(np.intp)
+    else:
+        raise ValueError(f"Unknown sampling plan {kind!r}, expected one of {PLAN_KINDS}")
+
+    index = np.sort(index).astype(np.intp)
+    index.flags.writeable = False
+    return index
+
+
+class PixelSampler:
+    """
+    Gathers a plan's pixels from (N, 3) tile pixels into a reused buffer.
+
+    With rotate=True the plan is shifted along the tile by a golden-ratio
+    fraction of its spacing on every call, so over a few frames the samples
+    cover the pixels the fixed plan skips while each single frame stays as
+    evenly spread as the plan.
+    """
+    def __init__(self, size=(100, 100), count=256, kind="stratified", rotate=False):
+        self.plan = sampling_plan(tuple(size), count, kind)
+        self.n = size[0] * size[1]
+        self.step = max(1, int(round(_GOLDEN * self.n / len(self.plan)))) if rotate else 0
+        self.offset = 0
+        self._index = np.empty_like(self.plan)
+        self._out = None
+
+    def __call__(self, pixels):
+        index = self.plan
+        if self.step:
+            index = np.add(self.plan, self.offset, out=self._index)
+            index %= self.n
+            self.offset = (self.offset + self.step) % self.n
+
+        if self._out is None or self._out.shape[1:] != pixels.shape[1:] or self._out.dtype != pixels.dtype:
+            self._out = np.empty((len(index),) + pixels.shape[1:], dtype=pixels.dtype)
+        return np.take(pixels, index, axis=0, out=self._out)
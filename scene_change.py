@@ -0,0 +1,152 @@
+import zlib
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+
+# BT.601 luma weights in BGR order, scaled to sum to 256
+LUMA_WEIGHTS = np.array([29, 150, 77], dtype=np.uint16)
+
+
+# The 8 corners of a histogram cell, for trilinear bin assignment
+_CORNERS = np.array([[b, g, r] for b in (0, 1) for g in (0, 1) for r in (0, 1)])
+
+# A detected cut: confidence in [0, 1], hard when it clears hard_confidence,
+# plus the two raw differences it was scored from
+SceneCut = namedtuple("SceneCut", "confidence hard luma_diff hist_diff")
+
+
+def thumbnail(frame, size=16):
+    """size x size area average of a frame, frames already that size are returned as is."""
+    if frame.shape[:2] == (size, size):
+        return frame
+    return cv2.resize(frame, (size, size), interpolation=cv2.INTER_AREA)
+
+
+def soft_histogram(pixels, levels=4):
+    """
+    Normalised levels^3 colour histogram of (..., 3) pixels with trilinear
+    (soft) bin assignment: each pixel spreads its weight over the 8 nearest
+    bin centres, so a slow fade moves weight gradually between neighbouring
+    bins instead of flipping every pixel across a bin edge at once.
+    """
+    pos = pixels.reshape(-1, 3) * (levels / 256.0) - 0.5
+    lo = np.floor(pos)
+    frac = pos - lo
+    idx = np.clip(lo.astype(np.intp)[:, None, :] + _CORNERS, 0, levels - 1)
+    weights = np.where(_CORNERS, frac[:, None, :], 1.0 - frac[:, None, :]).prod(axis=2)
+    index = (idx[:, :, 0] * levels + idx[:, :, 1]) * levels + idx[:, :, 2]
+    return np.bincount(index.ravel(), weights=weights.ravel(), minlength=levels ** 3) / len(pos)
+
+
+def frame_signature(frame, size=16):
+    """
+    Tiny BGR thumbnail of a BGR/BGRA frame plus a CRC of its bytes. Colour,
+    not just luma, so a hue shift at constant brightness still registers.
+    """
+    thumb = np.ascontiguousarray(thumbnail(frame, size)[:, :, :3])
+    return thumb, zlib.crc32(thumb.tobytes())
+
+
+class SceneCutDetector:
+    """
+    Scores every frame against the previous one for a scene cut.
+
+    Two cheap measures on a size x size thumbnail: the mean absolute luma step
+    and the total variation distance between soft 4x4x4 colour histograms,
+    which also catches cuts between shots of similar brightness. Each is
+    scaled by the difference that counts as a certain cut and the larger one
+    is the confidence. Calling it returns a SceneCut once the confidence
+    reaches cut_confidence, otherwise None. For holdoff frames after a hard
+    cut further cuts are reported as soft, so one transition can't reset
+    downstream state on several consecutive frames.
+    """
+    def __init__(self, luma_scale=40.0, hist_scale=0.6, cut_confidence=0.5, hard_confidence=0.75, size=16,
+                 holdoff=5):
+        self.luma_scale = luma_scale
+        self.hist_scale = hist_scale
+        self.cut_confidence = cut_confidence
+        self.hard_confidence = hard_confidence
+        self.size = size
+        self.holdoff = holdoff
+        self.cuts = 0
+        self._luma = None
+        self._hist = None
+        self._since_hard = holdoff
+
+    def reset(self):
+        self._luma = None
+        self._hist = None
+        self._since_hard = self.holdoff
+
+    def __call__(self, frame):
+        thumb = thumbnail(frame, self.size)[:, :, :3]
+        luma = ((thumb @ LUMA_WEIGHTS) >> 8).astype(np.int16)
+        hist = soft_histogram(thumb)
+        self._since_hard += 1
+
+        previous_luma, previous_hist = self._luma, self._hist
+        self._luma, self._hist = luma, hist
+        if previous_luma is None:
+            return None
+
+        luma_diff = float(np.abs(luma - previous_luma).mean())
+        hist_diff = float(np.abs(hist - previous_hist).sum() / 2)
+        confidence = min(1.0, max(luma_diff / self.luma_scale, hist_diff / self.hist_scale))
+        if confidence < self.cut_confidence:
+            return None
+        self.cuts += 1
+        hard = confidence >= self.hard_confidence and self._since_hard > self.holdoff
+        if hard:
+            self._since_hard = 0
+        return SceneCut(confidence, hard, luma_diff, hist_diff)
+
+
+class ChangeGate:
+    """
+    Decides whether a frame is worth re-analysing.
+
+    check() returns (due, changed): due is True when the smoothed output should
+    be updated (every interval, or early on a scene cut), changed is True when
+    the picture moved enough since the last analysed frame to rerun the colour
+    extractor. Differences are mean absolute BGR steps on the signature; cuts
+    come from cut_detector and the latest one is kept in last_cut (None when
+    the frame was not a cut), so callers can snap their state on hard cuts.
+    """
+    def __init__(self, frame_counter, threshold=2.0, cut_detector=None, size=16):
+        self.frame_counter = frame_counter
+        self.threshold = threshold
+        self.cut_detector = cut_detector if cut_detector is not None else SceneCutDetector(size=size)
+        self.size = size
+        self.last_cut = None
+        self._last_thumb = None
+        self._last_crc = None
+
+    def difference(self, thumb, crc):
+        if self._last_thumb is None:
+            return float("inf")
+        if crc == self._last_crc:
+            return 0.0
+        return float(np.abs(thumb.astype(np.int16) - self._last_thumb).mean())
+
+    def check(self, frame):
+        # One thumbnail for both the signature and the cut detector
+        thumb = thumbnail(frame, self.size)
+        signature, crc = frame_signature(thumb, self.size)
+        diff = self.difference(signature, crc)
+        self.last_cut = self.cut_detector(thumb)
+
+        if self.last_cut is not None or self._last_thumb is None:
+            # Scene cut between intervals, analyse now and restart the interval
+            self.frame_counter.frame_count = 0
+            due, changed = True, True
+        elif self.frame_counter.is_time_to_operate():
+            due, changed = True, diff >= self.threshold
+        else:
+            due, changed = False, False
+
+        if changed:
+            self._last_thumb = signature.astype(np.int16)
+            self._last_crc = crc
+        return due, changed
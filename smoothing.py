@@ -0,0 +1,205 @@
+'''
+Temporal smoothing of dominant colour palettes.
+'''
+from functools import lru_cache
+from itertools import permutations
+from math import exp
+from time import monotonic
+
+import numpy as np
+
+# Up to this many colours every assignment is tried, above it matching is greedy
+_EXACT_MATCH_MAX = 6
+# Blend weights are integers out of 1 << _WEIGHT_BITS
+_WEIGHT_BITS = 16
+
+
+@lru_cache(maxsize=None)
+def _permutations(K):
+    perms = np.array(list(permutations(range(K))), dtype=np.intp)
+    perms.flags.writeable = False
+    return perms
+
+
+class ColourMatcher:
+    """
+    Minimum-cost assignment of K new colours to K previous slots.
+
+    Calling it returns perm with colors[perm[i]] being the colour for slot i,
+    minimising the total squared BGR distance. Exact for K <= 6 (all K!
+    assignments in one vectorised gather and sum), greedy on the closest
+    remaining pair above that. All work arrays are allocated once, a call
+    only fills them in place. The returned perm is read-only and may be
+    shared between calls.
+    """
+    def __init__(self, K):
+        self.K = K
+        self._diff = np.empty((K, K, 3), dtype=np.int64)
+        self._cost = np.empty((K, K), dtype=np.int64)
+        if K <= _EXACT_MATCH_MAX:
+            self._perms = _permutations(K)
+            # Flat index of cost[i, perm[i]] for every assignment
+            self._flat = self._perms + np.arange(K) * K
+            self._gather = np.empty(self._perms.shape, dtype=np.int64)
+            self._totals = np.empty(len(self._perms), dtype=np.int64)
+        else:
+            self._greedy = np.empty((K, K), dtype=np.float64)
+            self._perm = np.empty(K, dtype=np.intp)
+
+    def __call__(self, previous, colors):
+        diff = self._diff
+        np.subtract(np.asarray(previous)[:, None, :], np.asarray(colors)[None, :, :], out=diff, dtype=np.int64)
+        np.square(diff, out=diff)
+        cost = diff.sum(axis=2, out=self._cost)
+
+        if self.K <= _EXACT_MATCH_MAX:
+            np.take(cost, self._flat, out=self._gather)
+            return self._perms[self._gather.sum(axis=1, out=self._totals).argmin()]
+
+        perm = self._perm
+        greedy = self._greedy
+        greedy[...] = cost
+        for _ in range(self.K):
+            slot, colour = divmod(int(greedy.argmin()), self.K)
+            perm[slot] = colour
+            greedy[slot, :] = np.inf
+            greedy[:, colour] = np.inf
+        return perm
+
+
+def match_colours(previous, colors):
+    """One-off ColourMatcher call, see ColourMatcher."""
+    return ColourMatcher(len(previous))(previous, colors)
+
+
+class PaletteSmoother:
+    """
+    Exponential moving average of a (K, 3) palette in integer fixed point.
+
+    The state is int32 with frac_bits fractional bits and blend weights are
+    integers out of 1 << 16, so an update is a handful of in-place integer ops
+    on preallocated arrays and never goes through float.
+
+    With a fixed alpha every add_colors() call moves the palette that fraction
+    of the way, so the effective time constant depends on how often it is
+    called. With tau (seconds) the palette instead follows the latest input as
+    a first-order lag in wall-clock time: alpha = 1 - exp(-dt / tau) for the
+    monotonic time dt elapsed, whatever the analysis rate. colors_at(t) then
+    gives the palette at any timestamp since the last update, so a renderer
+    can draw at its own rate between analyses. tau=0 (or alpha=1.0) passes
+    colours straight through.
+
+    Extractors order colours by cluster size, so the same colour can arrive
+    in a different position from one frame to the next. With match=True each
+    update first assigns the new colours to the existing slots by minimum
+    colour distance (ColourMatcher) and blends slot to slot; the output is
+    still listed in the order of the latest input, largest cluster first.
+
+    get_average_colors() and colors_at() return the same uint8 (K, 3) array
+    every call, copy it if it has to outlive the next call.
+    """
+    def __init__(self, alpha=0.3, num_colors=3, frac_bits=8, match=True, tau=None):
+        self.num_colors = num_colors
+        self.frac_bits = frac_bits
+        self.match = match
+        self.tau = tau
+        self.weight = self._weight(alpha)
+
+        self._state = np.zeros((num_colors, 3), dtype=np.int32)
+        self._target = np.zeros((num_colors, 3), dtype=np.int32)
+        self._new = np.zeros((num_colors, 3), dtype=np.int32)
+        # Wide enough for a scaled colour step times a 16 bit weight
+        self._delta = np.zeros((num_colors, 3), dtype=np.int64)
+        self._out = np.zeros((num_colors, 3), dtype=np.uint8)
+        # Integer colours of the state and the latest input, for matching
+        self._state_q = np.zeros((num_colors, 3), dtype=np.int32)
+        self._new_q = np.zeros((num_colors, 3), dtype=np.int32)
+        self._matcher = ColourMatcher(num_colors)
+        # Position of every slot in the latest input
+        self._rank = np.arange(num_colors)
+        self._primed = False
+        self._timestamp = None
+
+    @staticmethod
+    def _weight(alpha):
+        one = 1 << _WEIGHT_BITS
+        return min(max(int(round(alpha * one)), 0), one)
+
+    @property
+    def alpha(self):
+        return self.weight / (1 << _WEIGHT_BITS)
+
+    def _time_weight(self, t):
+        if self.tau <= 0:
+            return 1 << _WEIGHT_BITS
+        dt = max(t - self._timestamp, 0.0)
+        return self._weight(1.0 - exp(-dt / self.tau))
+
+    def _blend(self, weight, out):
+        """out = state + (target - state) * weight, rounded to nearest."""
+        delta = self._delta
+        np.subtract(self._target, self._state, out=delta)
+        delta *= weight
+        delta += 1 << (_WEIGHT_BITS - 1)
+        delta >>= _WEIGHT_BITS
+        delta += self._state
+        out[...] = delta
+        return out
+
+    def reset(self):
+        """Forget the history, the next palette is taken as is."""
+        self._primed = False
+
+    def add_colors(self, colors, timestamp=None):
+        if timestamp is None:
+            timestamp = monotonic()
+        self._new[...] = colors
+        self._new <<= self.frac_bits
+        if not self._primed:
+            self._state[...] = self._new
+            self._target[...] = self._new
+            self._rank = np.arange(self.num_colors)
+            self._primed = True
+            self._timestamp = timestamp
+            return
+
+        if self.tau is not None:
+            # Catch the state up to now on the previous input, then aim for the new one
+            self._blend(self._time_weight(timestamp), self._state)
+            self._timestamp = timestamp
+
+        if self.match:
+            np.right_shift(self._state, self.frac_bits, out=self._state_q)
+            np.right_shift(self._new, self.frac_bits, out=self._new_q)
+            self._rank = self._matcher(self._state_q, self._new_q)
+        np.take(self._new, self._rank, axis=0, out=self._target)
+
+        if self.tau is None:
+            self._blend(self.weight, self._state)
+
+    def save(self):
+        """(state, target, rank, timestamp) of the model, for publishing to other processes."""
+        return self._state, self._target, self._rank, self._timestamp
+
+    def load(self, state, target, rank, timestamp):
+        """Adopt a state from save(), colors_at() then continues from it."""
+        self._state[...] = state
+        self._target[...] = target
+        self._rank = np.array(rank, dtype=np.intp)
+        self._timestamp = timestamp
+        self._primed = True
+
+    def colors_at(self, t=None):
+        """The palette at monotonic time t (default now), between or after updates."""
+        if self.tau is None or not self._primed:
+            self._delta[...] = self._state
+        else:
+            self._blend(self._time_weight(monotonic() if t is None else t), self._delta)
+        scaled = self._delta
+        scaled += 1 << (self.frac_bits - 1)
+        scaled >>= self.frac_bits
+        self._out[self._rank] = scaled
+        return self._out
+
+    def get_average_colors(self):
+        return self.colors_at()
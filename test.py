@@ -8,6 +8,7 @@ def create_bar(height, width, color):
     red, green, blue = int(color[2]), int(color[1]), int(color[0])
     return bar, (red, green, blue)
 
+# Written by python main.py --save screenshot.png
 img = cv2.imread('screenshot.png')
 height, width, _ = np.shape(img)
 # print(height, width)
@@ -4,11 +4,23 @@ IDEAS
 - less frquenctly, e.g. check dominant color every 5 frames
 - also look into light sync devices how they check for color
 '''
+import argparse
+
 import cv2
 import numpy as np
 import mss
-from time import time
-from multiprocessing import Process, Manager
+from time import sleep, time
+from multiprocessing import Event, Process
+
+from capture import Downsampler, compose_preview
+from capture_clock import CaptureClock
+from colour_state import ColourState
+from colour_extractors import EXTRACTORS, make_extractor
+from frame_sources import open_source
+from frame_ring import FrameRing
+from recording import FrameRecorder
+from scene_change import ChangeGate, SceneCutDetector
+from smoothing import PaletteSmoother
 
 import cProfile
 
@@ -73,72 +85,87 @@ class FrameCounter:
             return True
         return False
 
-class MultiColorExponentialMovingAverage:
-    def __init__(self, alpha=0.01, num_colors=3):
-        self.alpha = alpha
-        self.num_colors = num_colors
-        self.average_colors = [None] * num_colors
-    
-    def add_colors(self, colors):
-        for i in range(self.num_colors):
-            if self.average_colors[i] is None:
-                self.average_colors[i] = np.array(colors[i], dtype=np.float32)
-            else:
-                self.average_colors[i] = self.alpha * np.array(colors[i], dtype=np.float32) + (1 - self.alpha) * self.average_colors[i]
-    
-    def get_average_colors(self):
-        return [np.uint8(c).tolist() for c in self.average_colors]
-
-
-def kmeans_get_colours(frame, K=3):
-    # Convert image to data (resize to reduce complexity)
-    pixels = cv2.resize(frame, (100, 100)).reshape((-1, 3))
-
-    sample_fraction = 1
-    # Sample a fraction of the pixels randomly
-    num_pixels = len(pixels)
-    sampled_pixels = pixels[np.random.choice(num_pixels, int(num_pixels * sample_fraction), replace=False)]
 
-    # Convert to np.float32
-    sampled_pixels = np.float32(sampled_pixels)
-
-    # Define criteria and apply kmeans()
-    criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 10, 1.0)
-    _, labels, centers = cv2.kmeans(sampled_pixels, K, None, criteria, 10, cv2.KMEANS_RANDOM_CENTERS)
-    
-    # Convert centers to integers
-    centers = np.uint8(centers)
-
-    # Identify the three most dominant colors based on the cluster sizes
-    cluster_sizes = np.bincount(labels.flatten())
-    dominant_idxs = np.argsort(-cluster_sizes)[:K]  # Get indexes of K largest clusters
-    
-    # Extract the colors corresponding to these indexes
-    dominant_colors = centers[dominant_idxs].tolist()
-
-    return dominant_colors
+def capture_frames(source_spec, monitor, tile_ring, frame_ring, stop_event, record_path=None, rate=40.0):
+    # The source is opened here, mss handles can't be shared across processes
+    recorder = None
+    clock = CaptureClock(rate)
+    # Analysis only ever sees the area-averaged tile, full frames go to the preview ring if there is one
+    downsample = Downsampler(analysis_size=tile_ring.shape[1::-1])
+    try:
+        with open_source(source_spec, monitor) as source:
+            while True:
+                clock.tick()
+                frame = source.read()
+                if frame is None:
+                    break
+                tile, _ = downsample(frame)
+                tile_ring.write(tile)
+                if frame_ring is not None:
+                    # Views over the source buffer, one memcpy into the next shared slot
+                    frame_ring.write(frame)
+                if record_path is not None:
+                    if recorder is None:
+                        recorder = FrameRecorder(record_path, frame.shape)
+                    recorder.write(frame)
+                if stop_event.is_set():
+                    break
+    finally:
+        print(f"Capture: {clock.ticks} ticks, {clock.overruns} overruns")
+        if recorder is not None:
+            recorder.close()
 
-def capture_frames(monitor, shared_frame_data):
-    sct = mss.mss()
 
+def calculate_dominant_colors(tile_ring, colour_state, color_smoother, change_gate, palette_extractor):
+    last_seq = -1
+    dominant_colors = None
+    # Private copy of the tile, nothing acts on it until the slot is known to be intact
+    local_tile = None
     while True:
-        img = sct.grab(monitor)
-        img_np = np.array(img)
-        frame = cv2.cvtColor(img_np, cv2.COLOR_BGRA2BGR)
-        shared_frame_data['frame'] = frame
-
+        seq = tile_ring.latest()
+        if seq == last_seq:
+            # Nothing new yet, yield the core instead of spinning on the header
+            sleep(0.002)
+            continue
+        last_seq = seq
+        tile, stamp = tile_ring.read(seq)
+        if tile is None:
+            continue
+        if local_tile is None:
+            local_tile = np.empty_like(tile)
+        local_tile[...] = tile
+        if not tile_ring.is_valid(seq):
+            # The writer recycled the slot while we copied it, the tile may be torn
+            continue
+        tile = local_tile
+
+        due, changed = change_gate.check(tile)
+        cut = change_gate.last_cut
+        if cut is not None and cut.hard:
+            # New shot: recluster from scratch and let the colours snap instead of crawling over
+            if hasattr(palette_extractor, "reset"):
+                palette_extractor.reset()
+            color_smoother.reset()
+        # Same [[b, g, r], ...] output whichever strategy was picked
+        colors = None
+        if changed:
+            if getattr(palette_extractor, "tau", None) is not None:
+                # Time-constant models age their history by the capture timestamps
+                colors = palette_extractor(tile, timestamp=stamp)
+            else:
+                colors = palette_extractor(tile)
+        if colors is not None:
+            dominant_colors = colors
 
-def calculate_dominant_colors(shared_frame_data, color_smoother, frame_counter):
-    while True:
-        frame = shared_frame_data['frame']
+        if due and dominant_colors is not None:
+            # Static frames reuse the last result so the smoother still settles
+            color_smoother.add_colors(dominant_colors, timestamp=stamp)
 
-        if frame is not None and frame_counter.is_time_to_operate():
-            # Assuming kmeans_get_colours now returns three dominant colors
-            dominant_colors = kmeans_get_colours(frame, K=3)
-            color_smoother.add_colors(dominant_colors)
-            smooth_colors = color_smoother.get_average_colors()
+        if dominant_colors is not None:
+            # Time-constant smoothing keeps moving between analyses, publish it every tile
+            colour_state.publish(dominant_colors, color_smoother.colors_at(stamp), timestamp=stamp,
+                                 smoother=color_smoother)
 
-            shared_frame_data['smooth_colors'] = smooth_colors
 
 def create_radial_gradient(center_color, mid_color, outer_color, image_size):
     # Generate a grid of coordinates (x, y)
@@ -179,22 +206,15 @@ def create_radial_gradient(center_color, mid_color, outer_color, image_size):
 
     return np.clip(gradient_image, 0, 255).astype(np.uint8)
 
-def main():
-    with Manager() as manager:
-        shared_frame_data = manager.dict()
-        shared_frame_data['frame'] = None
-        shared_frame_data['smooth_colors'] = None
-
-        fps_counter = FPS()
-
-        monitor_number = 1
-        sct = mss.mss()
-
-        mon = mss.mss().monitors[monitor_number]
+def main(source_spec="mss", headless=False, record_path=None, rate=40.0, extractor="temporal-kmeans", tau=2.0):
+    fps_counter = FPS()
 
+    monitor = None
+    if source_spec in ("mss", "imagegrab"):
         # Monitor settings (adjust as needed)
         monitor_number = 1
-        mon = sct.monitors[monitor_number]
+        with mss.mss() as sct:
+            mon = sct.monitors[monitor_number]
         capture_width = 400
         capture_height = 300
 
@@ -206,66 +226,110 @@ def main():
             "mon": monitor_number,
         }
 
-        color_smoother = MultiColorExponentialMovingAverage(alpha=0.3, num_colors=3)
-
-        frame_counter = FrameCounter(interval_frames=30)  # For example, every 30 frames
-
-        frame_capture_process = Process(target=capture_frames, args=(monitor, shared_frame_data))
-        # Pass frame_counter to the color calculation process
-        color_calculation_process = Process(target=calculate_dominant_colors, args=(shared_frame_data, color_smoother, frame_counter))
-
-        pr = cProfile.Profile()
-        pr.enable()
-
-        frame_capture_process.start()
-        color_calculation_process.start()
-
-
-        try:
-            while True:
-                frame = shared_frame_data['frame']
-                smooth_colors = shared_frame_data['smooth_colors']
-
-                if frame is not None and smooth_colors is not None:
-                    frame_width = frame.shape[1]
-
-                    color_blocks = [np.full((100, frame_width // 3, 3), color, dtype=np.uint8) for color in smooth_colors]
-
-                    if sum(block.shape[1] for block in color_blocks) < frame_width:
-                        gap = frame_width - sum(block.shape[1] for block in color_blocks)
-                        last_block_width = color_blocks[-1].shape[1] + gap
-                        color_blocks[-1] = np.full((100, last_block_width, 3), smooth_colors[-1], dtype=np.uint8)
-
-                    color_row = np.hstack(color_blocks)
+    # Size the rings from one probe frame, sources differ in shape and channels
+    with open_source(source_spec, monitor) as probe:
+        frame_shape = probe.read().shape
+
+    # The minibatch model already smooths across frames, so it takes the time
+    # constant itself and the smoother only passes its colours through
+    color_smoother = PaletteSmoother(num_colors=3, tau=0.0 if extractor == "minibatch" else tau)
+
+    frame_counter = FrameCounter(interval_frames=30)  # For example, every 30 frames
+    # Skip k-means on unchanged frames, run it early on scene cuts
+    change_gate = ChangeGate(frame_counter, threshold=2.0, cut_detector=SceneCutDetector())
+    palette_extractor = make_extractor(extractor, K=3)
+    if extractor == "minibatch":
+        palette_extractor.tau = tau
+    # Colours go through a seqlocked shared block, the smoother itself only lives in the analysis process
+    colour_state = ColourState(num_colors=3)
+
+    # Analysis tiles always, full-resolution frames only when there is a window to show them
+    tile_ring = FrameRing((100, 100, frame_shape[2]), slots=4)
+    frame_ring = None if headless else FrameRing(frame_shape, slots=4)
+    stop_event = Event()
+
+    frame_capture_process = Process(target=capture_frames, args=(source_spec, monitor, tile_ring, frame_ring, stop_event, record_path, rate))
+    # Pass change_gate (and its frame_counter) to the color calculation process
+    color_calculation_process = Process(target=calculate_dominant_colors, args=(tile_ring, colour_state, color_smoother, change_gate, palette_extractor))
+
+    pr = cProfile.Profile()
+    pr.enable()
+
+    frame_capture_process.start()
+    color_calculation_process.start()
+
+
+    preview = None
+    # Reused buffers for reading the shared colour state
+    current_colors = np.empty((3, 3), dtype=np.uint8)
+    smooth_colors = np.empty((3, 3), dtype=np.uint8)
+
+    try:
+        while headless:
+            # No window, just report capture throughput until the source runs out
+            start_seq, start_time = tile_ring.latest(), time()
+            frame_capture_process.join(timeout=1.0)
+            fps = (tile_ring.latest() - start_seq) / (time() - start_time)
+            seq, _, _, _ = colour_state.read(current_colors, smooth_colors)
+            print(f"FPS: {fps:.1f} colours: {smooth_colors.tolist() if seq >= 0 else None}")
+            if not frame_capture_process.is_alive():
+                color_calculation_process.terminate()
+                break
+
+        while not headless:
+            frame_seq = frame_ring.latest()
+            frame, _ = frame_ring.read(frame_seq)
+
+            if frame is not None and colour_state.latest() >= 0:
+                # Interpolated at draw time from the published smoother state
+                smooth_colors = colour_state.colors_at()
+                # Single BGRA -> BGR copy into the preview buffer, overlay drawn on that
+                preview = compose_preview(frame, smooth_colors, out=preview)
+
+                # A slot recycled during the copy may be torn, skip showing that preview
+                if frame_ring.is_valid(frame_seq):
                     fps_counter.update()
-                    fps_counter.add_to_frame(frame)
+                    fps_counter.add_to_frame(preview)
 
-                    # gradient = create_radial_gradient(smooth_colors[0], smooth_colors[1], smooth_colors[2], (frame_width, 100))
+                    # gradient = create_radial_gradient(smooth_colors[0], smooth_colors[1], smooth_colors[2], (frame.shape[1], 100))
 
-                    # out = np.vstack([frame, color_row, gradient])
-
-                    out = np.vstack([frame, color_row])
-
-                    cv2.imshow("Screen Capture", out)
-
-                if cv2.waitKey(25) & 0xFF == ord("q"):
-                    frame_capture_process.terminate()
-                    color_calculation_process.terminate()
-                    cv2.destroyAllWindows()
-                    break
+                    cv2.imshow("Screen Capture", preview)
 
-        finally:
-            frame_capture_process.join()
-            color_calculation_process.join()
+            if cv2.waitKey(25) & 0xFF == ord("q"):
+                # Let capture exit its loop so a recording gets trimmed and indexed
+                stop_event.set()
+                color_calculation_process.terminate()
+                cv2.destroyAllWindows()
+                break
 
-            pr.disable()
+    finally:
+        frame_capture_process.join()
+        color_calculation_process.join()
+        tile_ring.close()
+        colour_state.close()
+        if frame_ring is not None:
+            frame_ring.close()
 
-            # Print profiling results
-            print("gi")
-            pr.print_stats(sort='cumulative')
-            pr.dump_stats('profile_results.prof')
+        pr.disable()
 
+        # Print profiling results
+        print("gi")
+        pr.print_stats(sort='cumulative')
+        pr.dump_stats('profile_results.prof')
 
 
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--source", default="mss",
+                        help="mss, imagegrab, video:PATH, images:GLOB or synthetic[:WxH]")
+    parser.add_argument("--headless", action="store_true", help="run without the preview window")
+    parser.add_argument("--record", metavar="PATH", help="record captured frames for replay:PATH")
+    parser.add_argument("--fps", type=float, default=40.0,
+                        help="capture rate, defaults to the 25 ms preview refresh (0 for unbounded)")
+    parser.add_argument("--extractor", default="temporal-kmeans", choices=sorted(EXTRACTORS),
+                        help="dominant colour strategy, trading accuracy for latency")
+    parser.add_argument("--tau", type=float, default=2.0,
+                        help="colour smoothing time constant in seconds, independent of the frame rate; "
+                             "with minibatch it sets the model's count decay")
+    args = parser.parse_args()
+    main(args.source, args.headless, args.record, args.fps or None, args.extractor, args.tau)
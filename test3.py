@@ -1,30 +1,27 @@
-import numpy as np
 import cv2
 
+from capture import compose_preview
+from capture_clock import CaptureClock
+from colour_extractors import kmeans_get_colours
+from frame_sources import VideoFileSource
 
-cap = cv2.VideoCapture("BigBuckBunny.mp4")
-n_clusters = 5
-
-while True:
-    status, image = cap.read()
-    if not status:
-        break
 
-    # to reduce complexity resize the image
-    data = cv2.resize(image, (100, 100)).reshape(-1, 3)
-    criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 10, 1.0)
-    flags = cv2.KMEANS_RANDOM_CENTERS
-    compactness, labels, centers = cv2.kmeans(data.astype(np.float32), n_clusters, None, criteria, 10, flags)
+source = VideoFileSource("BigBuckBunny.mp4")
+# Play back at the file's own frame rate instead of as fast as decoding allows
+clock = CaptureClock(rate=source.fps or 30)
+n_clusters = 5
+out = None
 
-    cluster_sizes = np.bincount(labels.flatten())
+for image in source:
+    clock.tick()
 
-    palette = []
-    for cluster_idx in np.argsort(-cluster_sizes):
-        palette.append(np.full((image.shape[0], image.shape[1], 3), fill_value=centers[cluster_idx].astype(int), dtype=np.uint8))
-    palette = np.hstack(palette)
+    # to reduce complexity kmeans_get_colours works on a 100x100 resize, largest cluster first
+    colors = kmeans_get_colours(image, K=n_clusters)
 
-    sf = image.shape[1] / palette.shape[1]
-    out = np.vstack([image, cv2.resize(palette, (0, 0), fx=sf, fy=sf)])
+    # Palette strip drawn straight into the output buffer instead of full-frame np.full blocks
+    out = compose_preview(image, colors, strip_height=image.shape[0] // n_clusters, out=out)
 
     cv2.imshow("dominant_colors", out)
-    cv2.waitKey(1)
\ No newline at end of file
+    cv2.waitKey(1)
+
+# For whole-film pre-analysis without a window see video_analysis.py
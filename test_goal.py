@@ -1,9 +1,15 @@
+import argparse
+
 import cv2
-import numpy as np
 from PIL import Image
-from PIL import ImageGrab
+import mss
 from skimage.metrics import structural_similarity
 
+from capture import CaptureScheduler
+from capture_clock import CaptureClock
+from frame_sources import open_source
+from recording import FrameRecorder
+
 
 #Area to capture. In this case our score will always be on the left hand side. This will be different depending on your game resolution.
 #Top left corner
@@ -22,32 +28,77 @@ display_frame = False
 
 #Have a cool down timer between goals detected to minimize the chances of false positives.
 coolval = 100
+
+#Serial port of the arduino, e.g. serial.Serial('COM3', 9600). None only prints the goals.
+s = None
 #~~~~~~~~~~~~~~~~~~CONFIG~~~~~~~~~~~~~~~~~~
 
 
-def main():
-    frame2 = np.array(ImageGrab.grab(bbox=(x, y, x2, y2)))
-    cool = 0
+def score_frames(source_spec):
+    """Score box crops, BGRA from the screen or BGR/BGRA from any other frame source."""
+    if source_spec == "mss":
+        # Score box as a scheduler region, other triggers can register theirs on the same grab
+        scheduler = CaptureScheduler(mss.mss())
+        scheduler.register("score", {"top": y, "left": x, "width": x2 - x, "height": y2 - y})
+        while True:
+            yield scheduler.tick()["score"]
+
+    # Other sources are full screen frames at the game resolution, cropped to the
+    # score box; frames already the size of the box (e.g. a recorded score box) pass as is
+    with open_source(source_spec) as source:
+        for frame in source:
+            if frame.shape[:2] != (y2 - y, x2 - x):
+                frame = frame[y:y2, x:x2]
+            yield frame
+
+
+def threshold_score(frame):
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGRA2GRAY if frame.shape[2] == 4 else cv2.COLOR_BGR2GRAY)
+
+    #Convert our image to black and white based on pixel intensity. This works because the score is displayed as a white font on orange/blue background, eliminating noise in our frame comparison.
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~#
+    thresh_frame = cv2.threshold(gray, 170, 255, cv2.THRESH_BINARY)[1]
+    thresh_frame = cv2.dilate(thresh_frame, None, iterations = 2)
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~#
+    return thresh_frame
+
+
+def main(source_spec="mss", headless=False, rate=30.0, record_path=None):
+    # Score changes are slow, no need to spin faster than the game renders
+    clock = CaptureClock(rate=rate)
+
+    frames = score_frames(source_spec)
+    first = next(frames)
+    # Score box crops only, replay:PATH feeds them back without cropping
+    recorder = None
+    if record_path is not None:
+        recorder = FrameRecorder(record_path, first.shape)
+        recorder.write(first)
+    # Sources may hand out views into a reused buffer, keep the thresholded copy instead
+    thresh_frame2 = threshold_score(first)
     print("Running")
+    try:
+        detect_goals(frames, clock, thresh_frame2, headless, recorder)
+    finally:
+        # Trim and index the recording even when stopped with Ctrl-C
+        if recorder is not None:
+            recorder.close()
+        frames.close()
+
+
+def detect_goals(frames, clock, thresh_frame2, headless, recorder=None):
+    cool = 0
     while(True):
-        print("Running2")
+        clock.tick()
 
-        img = ImageGrab.grab(bbox=(x, y, x2, y2))
-        frame = np.array(img)
+        frame = next(frames, None)
+        if frame is None:
+            break
+        if recorder is not None:
+            recorder.write(frame)
+        thresh_frame1 = threshold_score(frame)
 
-        grayA = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        grayB = cv2.cvtColor(frame2, cv2.COLOR_BGR2GRAY)
-        
-        #Convert our image to black and white based on pixel intensity. This works because the score is displayed as a white font on orange/blue background, eliminating noise in our frame comparison.
-        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~#
-        thresh_frame1 = cv2.threshold(grayA, 170, 255, cv2.THRESH_BINARY)[1] 
-        thresh_frame1 = cv2.dilate(thresh_frame1, None, iterations = 2) 
-
-        thresh_frame2 = cv2.threshold(grayB, 170, 255, cv2.THRESH_BINARY)[1] 
-        thresh_frame2 = cv2.dilate(thresh_frame2, None, iterations = 2) 
-        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~#
-        
-        if display_frame:
+        if display_frame and not headless:
             cv2.imshow('RocketLeague', thresh_frame1) #Display our modified frame
 
         (score, diff) = structural_similarity(thresh_frame1, thresh_frame2, full=True) #Compare the old and new frame for a SSIM score.
@@ -56,16 +107,25 @@ def main():
         if score < ssim_thresh_hold:
             if cool == coolval:
                 print("Goal!")
-                s.write(bytes(b'1')) #Send the number 1 over serial to the arduino
+                if s is not None:
+                    s.write(bytes(b'1')) #Send the number 1 over serial to the arduino
                 cool = 0 #Reset our counter after a goal is detecte
         
         if cool < coolval: #This block prevents the timer from contstatly counting upward to infinity if a goal is never detected
             cool += 1
 
-        frame2 = frame
+        thresh_frame2 = thresh_frame1
 
-        if cv2.waitKey(1) & 0xFF == ord('q'):
+        if not headless and cv2.waitKey(1) & 0xFF == ord('q'):
             break
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Goal detection on the score box")
+    parser.add_argument("--source", default="mss",
+                        help="mss, imagegrab, video:PATH, images:GLOB, synthetic[:WxH], "
+                             "replay:PATH or replay-realtime:PATH")
+    parser.add_argument("--headless", action="store_true", help="no window or key polling, e.g. on build machines")
+    parser.add_argument("--fps", type=float, default=30.0, help="capture rate (0 for unbounded)")
+    parser.add_argument("--record", metavar="PATH", help="record the score box for replay:PATH")
+    args = parser.parse_args()
+    main(args.source, args.headless, args.fps or None, args.record)
@@ -2,20 +2,21 @@ import cv2
 import mss
 import numpy as np
 from PIL import Image
-import pygetwindow as gw
+
+from window_tracker import WindowTracker
+
+# One tracker per title, so repeated calls reuse the window lookup and mss handle
+_trackers = {}
 
 def capture_window(window_title):
     try:
-        # Find the window with the specified title
-        windows = gw.getWindowsWithTitle(window_title)
-        if windows:
-            win = windows[0]  # Get the first window with the given title
-            window_bbox = {'top': win.top, 'left': win.left, 'width': win.width, 'height': win.height}
-            
-            with mss.mss() as sct:
-                window_capture = sct.grab(window_bbox)
-                window_img = Image.frombytes("RGB", window_capture.size, window_capture.bgra, "raw", "BGRX")
-                return np.array(window_img), win
+        tracker = _trackers.get(window_title)
+        if tracker is None:
+            tracker = _trackers[window_title] = WindowTracker(window_title)
+
+        window_capture, win = tracker.grab()
+        if window_capture is not None:
+            return cv2.cvtColor(window_capture, cv2.COLOR_BGRA2RGB), win
         else:
             return None, None
     except Exception as e:
@@ -6,7 +6,7 @@ window_width = 800
 window_height = 600
 window = 255 * np.ones((window_height, window_width, 3), dtype=np.uint8)
 
-# Load the image
+# Load the image, written by python main.py --save screenshot.png
 image = cv2.imread('screenshot.png', cv2.IMREAD_UNCHANGED)
 
 # Resize the image to fit within the window
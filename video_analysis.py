@@ -0,0 +1,76 @@
+'''
+Offline palette pre-analysis of a video file.
+
+    python video_analysis.py BigBuckBunny.mp4 -o bunny_palettes.npy
+
+Frames are area-downsampled into a preallocated (B, H, W, 3) batch and each
+full batch goes through batch_histogram_palettes, so the result is an
+(N, K, 3) uint8 array of per-frame BGR palettes, largest colour first.
+'''
+import argparse
+from time import perf_counter
+
+import cv2
+import numpy as np
+
+from colour_extractors import batch_histogram_palettes
+from frame_sources import VideoFileSource
+
+
+def analyze_video(path, K=3, batch_size=256, size=(100, 100), step=1):
+    """Return (N, K, 3) palettes for every step-th frame of the video."""
+    source = VideoFileSource(path)
+    batch = np.empty((batch_size, size[1], size[0], 3), dtype=np.uint8)
+    palettes = []
+    filled = 0
+    try:
+        frame_index = 0
+        while True:
+            if frame_index % step:
+                # Skipped frames are only demuxed, not converted
+                if not source.cap.grab():
+                    break
+                frame_index += 1
+                continue
+
+            frame = source.read()
+            if frame is None:
+                break
+            frame_index += 1
+
+            cv2.resize(frame, size, dst=batch[filled], interpolation=cv2.INTER_AREA)
+            filled += 1
+            if filled == batch_size:
+                palettes.append(batch_histogram_palettes(batch, K))
+                filled = 0
+
+        if filled:
+            palettes.append(batch_histogram_palettes(batch[:filled], K))
+    finally:
+        source.close()
+
+    if not palettes:
+        return np.empty((0, K, 3), dtype=np.uint8)
+    return np.concatenate(palettes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("video")
+    parser.add_argument("-o", "--output", help="where to save the (N, K, 3) palettes as .npy")
+    parser.add_argument("-K", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--step", type=int, default=1, help="analyse every step-th frame")
+    args = parser.parse_args()
+
+    start = perf_counter()
+    palettes = analyze_video(args.video, K=args.K, batch_size=args.batch_size, step=args.step)
+    elapsed = perf_counter() - start
+    print(f"{len(palettes)} frames in {elapsed:.1f} s ({len(palettes) / max(elapsed, 1e-9):.0f} frames/s)")
+
+    if args.output:
+        np.save(args.output, palettes)
+
+
+if __name__ == '__main__':
+    main()
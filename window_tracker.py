@@ -0,0 +1,65 @@
+from time import monotonic
+
+import mss
+import pygetwindow as gw
+
+from capture import grab_bgra
+from capture_clock import CaptureClock
+
+
+class WindowTracker:
+    """
+    Follows one window by title and grabs it with a long-lived mss handle.
+
+    The window lookup is cached and only repeated every refresh_interval
+    seconds, or straight away when a grab fails (window moved off screen,
+    closed, ...).
+    """
+    def __init__(self, window_title, refresh_interval=1.0, sct=None):
+        self.window_title = window_title
+        self.refresh_interval = refresh_interval
+        self.sct = sct if sct is not None else mss.mss()
+        self.window = None
+        self.bbox = None
+        self._resolved_at = None
+
+    def resolve(self):
+        """Look the window up again, returns it or None if it is gone."""
+        windows = gw.getWindowsWithTitle(self.window_title)
+        self._resolved_at = monotonic()
+        if not windows:
+            self.window = self.bbox = None
+            return None
+
+        win = windows[0]  # Get the first window with the given title
+        self.window = win
+        self.bbox = {'top': win.top, 'left': win.left, 'width': win.width, 'height': win.height}
+        return win
+
+    def _stale(self):
+        return self._resolved_at is None or monotonic() - self._resolved_at >= self.refresh_interval
+
+    def grab(self):
+        """Return (BGRA view, window), or (None, None) if the window isn't there."""
+        if self.bbox is None or self._stale():
+            self.resolve()
+        if self.bbox is None:
+            return None, None
+
+        try:
+            return grab_bgra(self.sct, self.bbox), self.window
+        except mss.exception.ScreenShotError:
+            # Geometry is probably out of date, look again and retry once
+            if self.resolve() is None:
+                return None, None
+            return grab_bgra(self.sct, self.bbox), self.window
+
+    def frames(self, rate=30.0):
+        """Yield (BGRA view, window) crops at rate, (None, None) while the window is missing."""
+        clock = CaptureClock(rate)
+        while True:
+            clock.tick()
+            yield self.grab()
+
+    def close(self):
+        self.sct.close()
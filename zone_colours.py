@@ -0,0 +1,75 @@
+'''
+Per-zone colours for spatially resolved effects (ambilight strips, peripheral
+projection).
+
+The frame is area-downsampled once into a grid of cols x rows equal cells and
+every zone's mean and dominant colour come out of that single small tile: the
+means from one integer sum over the cells, the dominant colours from
+batch_histogram_palettes with each zone as one "frame" of the batch.
+'''
+import cv2
+import numpy as np
+
+from colour_extractors import batch_histogram_palettes
+
+
+def border_zones(cols, rows):
+    """Cell indices of the outer ring, clockwise from the top-left corner."""
+    cells = np.arange(rows * cols).reshape(rows, cols)
+    if rows == 1 or cols == 1:
+        return cells.ravel()
+    return np.concatenate([
+        cells[0, :],
+        cells[1:-1, -1],
+        cells[-1, ::-1],
+        cells[-2:0:-1, 0],
+    ])
+
+
+class ZoneGrid:
+    """
+    Mean and dominant colour of every zone of a cols x rows grid.
+
+    cell is the (width, height) each zone is reduced to before analysis, so the
+    whole frame is resized to (cols * width, rows * height) in one go. With
+    border=True only the outer ring of cells is kept, ordered clockwise from
+    the top-left, which is the usual LED strip layout.
+    """
+    def __init__(self, cols=8, rows=4, cell=(20, 20), border=False, bins=16):
+        self.cols = cols
+        self.rows = rows
+        self.cell = cell
+        self.bins = bins
+        self.zones = border_zones(cols, rows) if border else None
+        self._tile = None
+        self._cells = None
+
+    def __len__(self):
+        return self.rows * self.cols if self.zones is None else len(self.zones)
+
+    def rects(self, width, height):
+        """(x1, y1, x2, y2) of every zone on a width x height frame, in output order."""
+        xs = [c * width // self.cols for c in range(self.cols + 1)]
+        ys = [r * height // self.rows for r in range(self.rows + 1)]
+        cells = [(xs[c], ys[r], xs[c + 1], ys[r + 1]) for r in range(self.rows) for c in range(self.cols)]
+        order = range(len(cells)) if self.zones is None else self.zones
+        return [cells[i] for i in order]
+
+    def __call__(self, frame):
+        """Return (means, dominant), both (zones, 3) uint8 BGR."""
+        cw, ch = self.cell
+        channels = frame.shape[2]
+        if self._tile is None or self._tile.shape[2] != channels:
+            self._tile = np.empty((self.rows * ch, self.cols * cw, channels), dtype=np.uint8)
+            self._cells = np.empty((self.rows, self.cols, ch, cw, channels), dtype=np.uint8)
+
+        cv2.resize(frame, (self.cols * cw, self.rows * ch), dst=self._tile, interpolation=cv2.INTER_AREA)
+        # Regroup the tile so every cell's pixels are contiguous
+        self._cells[...] = self._tile.reshape(self.rows, ch, self.cols, cw, channels).swapaxes(1, 2)
+        cells = self._cells.reshape(self.rows * self.cols, ch * cw, channels)[:, :, :3]
+        if self.zones is not None:
+            cells = cells[self.zones]
+
+        means = (cells.sum(axis=1, dtype=np.uint32) // (ch * cw)).astype(np.uint8)
+        dominant = batch_histogram_palettes(cells, K=1, bins=self.bins)[:, 0]
+        return means, dominant